@@ -1,38 +1,89 @@
+from functools import lru_cache
+
 from swarm import Agent
-from .prompts import search_prompt, get_profiler_prompt, get_diversity_prompt, get_synthesizer_prompt, get_creative_editor_prompt
-from app.config import MODEL
+from .prompts import (
+    search_prompt,
+    get_profiler_prompt,
+    get_diversity_prompt,
+    get_synthesizer_prompt,
+    get_creative_editor_prompt,
+    get_fused_prompt,
+    FOCUS_INSTRUCTIONS,
+    DEPTH_INSTRUCTIONS,
+    TONES,
+    PROMPT_CACHE_SIZE,
+)
+from app.config import STAGE_MODELS, FUSED_REPORT_COMBOS
+
+# Agents are built once per combination and shared between jobs; treat them as read-only.
 
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
 def create_search_agent():
     return Agent(
         name="Search Query Refiner",
         instructions=search_prompt,
-        model=MODEL
+        model=STAGE_MODELS["refine"]
     )
 
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
 def create_source_profiler_agent(focus: str):
     return Agent(
         name="Source Profiler",
         instructions=get_profiler_prompt(focus),
-        model=MODEL
+        model=STAGE_MODELS["profiling"]
     )
 
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
 def create_diversity_selector_agent(focus: str, depth: int):
     return Agent(
         name="Diversity Selector",
         instructions=get_diversity_prompt(focus, depth),
-        model=MODEL
+        model=STAGE_MODELS["selection"]
     )
 
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
 def create_debate_synthesizer_agent(focus: str, depth: int):
     return Agent(
         name="Debate Synthesizer",
         instructions=get_synthesizer_prompt(focus, depth),
-        model=MODEL
+        model=STAGE_MODELS["synthesis"]
     )
 
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
 def create_creative_editor_agent(focus: str, depth: int, tone: str):
     return Agent(
         name="Creative Editor",
         instructions=get_creative_editor_prompt(focus, depth, tone),
-        model=MODEL
-    )
\ No newline at end of file
+        model=STAGE_MODELS["editing"]
+    )
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def create_fused_report_agent(focus: str, depth: int, tone: str):
+    return Agent(
+        name="Debate Synthesizer + Creative Editor",
+        instructions=get_fused_prompt(focus, depth, tone),
+        model=STAGE_MODELS["fused"]
+    )
+
+def uses_fused_report(depth: int, tone: str, combos: str = FUSED_REPORT_COMBOS):
+    """True if FUSED_REPORT_COMBOS ("depth:tone,..." with * wildcards) selects this depth and tone."""
+    for combo in combos.split(","):
+        combo_depth, _, combo_tone = combo.strip().partition(":")
+        if not combo_depth:
+            continue
+        if combo_depth.strip() in ("*", str(depth)) and combo_tone.strip() in ("", "*", tone):
+            return True
+    return False
+
+def warm_agents():
+    """Build every agent for each known focus/depth/tone up front; returns how many were built."""
+    agents = [create_search_agent()]
+    for focus in FOCUS_INSTRUCTIONS:
+        agents.append(create_source_profiler_agent(focus))
+        for depth in DEPTH_INSTRUCTIONS:
+            agents.append(create_diversity_selector_agent(focus, depth))
+            agents.append(create_debate_synthesizer_agent(focus, depth))
+            for tone in TONES:
+                agents.append(create_creative_editor_agent(focus, depth, tone))
+                agents.append(create_fused_report_agent(focus, depth, tone))
+    return len(agents)
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 search_prompt = """
 You are an expert at refining user queries into effective search terms for a news search engine powered by SerpAPI (Google News).
 Your task is to take a user's topic, which might be conversational or vague, and distill it into its core keywords. The output will be directly used as the 'q' parameter in a Google News search.
@@ -106,6 +108,17 @@ DEPTH_INSTRUCTIONS = {
         "creative": "Create rich, engaging content for engaged readers. Add illuminating details and context. Connect to bigger patterns. Reward the time investment with genuine insights. At least 5 Solid paragraphs"
     }
 }
+
+TONES = ["Grandma Mode", "News with attitude", "Gen Z Mode", "Sharp & Snappy"]
+
+# Prompts are rendered once per focus/depth/tone combination and reused, so every job with the
+# same preferences sends byte-identical instructions (and hits the provider's prompt cache).
+PROMPT_CACHE_SIZE = 256
+
+# Number of articles the local diversity selector picks per depth, matching DEPTH_INSTRUCTIONS["diversity"].
+DEPTH_SELECTION_COUNTS = {1: 3, 2: 5, 3: 7}
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
 def get_profiler_prompt(focus: str):
     focus_instruction = FOCUS_INSTRUCTIONS.get(focus, FOCUS_INSTRUCTIONS["Just the Facts"])["profiler"]
     example_json = '''[
@@ -152,6 +165,7 @@ Your final output **must be a single JSON array** containing the profile object
 
 """
 
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
 def get_diversity_prompt(focus: str, depth:int):
     focus_instruction = FOCUS_INSTRUCTIONS.get(focus, FOCUS_INSTRUCTIONS["Just the Facts"])["diversity"]
     depth_instruction = DEPTH_INSTRUCTIONS[depth]["diversity"]
@@ -190,6 +204,7 @@ Remember: Your choices determine whether readers get a real debate or just varia
 
 """
 
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
 def get_synthesizer_prompt(focus: str, depth:int):
     focus_instruction = FOCUS_INSTRUCTIONS.get(focus, FOCUS_INSTRUCTIONS["Just the Facts"])["synthesizer"]
     depth_instruction = DEPTH_INSTRUCTIONS[depth]["synthesizer"]
@@ -235,6 +250,7 @@ Remember: Readers come here because they know single-source news lies by omissio
 The Creative Agent will handle tone and style features - you focus on structure and perspective contrast according to the focus instruction above.
 """
 
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
 def get_creative_editor_prompt(focus: str, depth:int, tone:str):
     focus_instruction = FOCUS_INSTRUCTIONS.get(focus, FOCUS_INSTRUCTIONS["Just the Facts"])["creative"]
     depth_instruction = DEPTH_INSTRUCTIONS[depth]["creative"]
@@ -536,3 +552,21 @@ Strip everything that isn't essential. Then strip again. The focus and depth ins
 """
 
 
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def get_fused_prompt(focus: str, depth:int, tone:str):
+    return f"""
+You do two jobs in a single pass: first you are the Debate Synthesizer, then the Creative Editor who rewrites the synthesis for the reader. Only the Creative Editor's finished piece is shown to anyone, so draft the synthesis silently and output nothing but the final edited report.
+
+=== PART 1: SYNTHESIS BRIEF (what the report must cover) ===
+{get_synthesizer_prompt(focus, depth)}
+
+=== PART 2: EDITING BRIEF (how the report must read) ===
+{get_creative_editor_prompt(focus, depth, tone)}
+
+=== HOW TO COMBINE THEM ===
+- Work out the contrasting perspectives exactly as the synthesis brief asks, then write them up directly in the editor's voice and format.
+- Wherever the editing brief talks about the synthesis or report you receive, apply it to your own unpublished synthesis.
+- Keep every [Source Name](url) link from the articles; never invent sources or URLs.
+- The reading time in the editing brief sets the final length.
+"""
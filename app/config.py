@@ -16,8 +16,172 @@ def get_secret(key, default=None):
         logger.error(f"❌ {key} not found in environment")
     return env_value
 
+def get_setting(key, default, cast=str):
+    """Get a non-secret tuning knob from the environment, falling back to `default`."""
+    env_value = os.getenv(key)
+    if env_value is None or env_value == "":
+        return default
+    try:
+        if cast is bool:
+            return env_value.strip().lower() in ("1", "true", "yes", "on")
+        return cast(env_value)
+    except ValueError:
+        logger.warning(f"⚠️ Invalid value for {key}: {env_value!r}, using default {default!r}")
+        return default
+
 # Load configuration
 SERPAPI_KEY = get_secret("SERPAPI_API_KEY")
 OPENAI_API_KEY = get_secret("OPENAI_API_KEY")
+DEBUG_API_TOKEN = os.getenv("DEBUG_API_TOKEN")  # bearer token for /api/debug/*; unset = those endpoints are off
 MODEL = "gpt-4.1-mini-2025-04-14"
 NUM_SOURCES = 15
+
+# Caching
+CACHE_DIR = get_setting("CACHE_DIR", os.path.join("news_output", "cache"))
+ARTICLE_CACHE_TTL = get_setting("ARTICLE_CACHE_TTL", 6 * 60 * 60, int)              # seconds an extracted article stays fresh
+ARTICLE_CACHE_NEGATIVE_TTL = get_setting("ARTICLE_CACHE_NEGATIVE_TTL", 10 * 60, int) # seconds a failed download is remembered
+ARTICLE_CACHE_MEMORY_ITEMS = get_setting("ARTICLE_CACHE_MEMORY_ITEMS", 512, int)     # in-process LRU entries
+ARTICLE_CACHE_DISK_BYTES = get_setting("ARTICLE_CACHE_DISK_BYTES", 256 * 1024 * 1024, int)
+SERP_CACHE_FRESH_SECONDS = get_setting("SERP_CACHE_FRESH_SECONDS", 15 * 60, int)    # serve SerpAPI results without refreshing
+SERP_CACHE_STALE_SECONDS = get_setting("SERP_CACHE_STALE_SECONDS", 2 * 60 * 60, int) # serve stale results while refreshing in the background
+SERP_CACHE_MEMORY_ITEMS = get_setting("SERP_CACHE_MEMORY_ITEMS", 256, int)
+SERP_CACHE_DISK_BYTES = get_setting("SERP_CACHE_DISK_BYTES", 32 * 1024 * 1024, int)
+
+# Article fetching
+FETCH_MAX_CONNECTIONS = get_setting("FETCH_MAX_CONNECTIONS", 100, int)  # global cap across all jobs
+FETCH_MAX_PER_HOST = get_setting("FETCH_MAX_PER_HOST", 4, int)
+FETCH_CONNECT_TIMEOUT = get_setting("FETCH_CONNECT_TIMEOUT", 5.0, float)
+FETCH_READ_TIMEOUT = get_setting("FETCH_READ_TIMEOUT", 10.0, float)
+FETCH_TOTAL_TIMEOUT = get_setting("FETCH_TOTAL_TIMEOUT", 20.0, float)
+FETCH_MAX_BYTES = get_setting("FETCH_MAX_BYTES", 3 * 1024 * 1024, int)  # stop reading a page after this many bytes
+FETCH_USER_AGENT = get_setting(
+    "FETCH_USER_AGENT",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+)
+
+# Article extraction
+EXTRACTION_EXECUTOR = get_setting("EXTRACTION_EXECUTOR", "thread")  # "thread" or "process"
+EXTRACTION_PROCESS_WORKERS = get_setting("EXTRACTION_PROCESS_WORKERS", os.cpu_count() or 1, int)
+EXTRACTION_MAX_TASKS_PER_CHILD = get_setting("EXTRACTION_MAX_TASKS_PER_CHILD", 200, int)  # recycle workers to cap memory growth
+EXTRACTION_INLINE_MAX_BYTES = get_setting("EXTRACTION_INLINE_MAX_BYTES", 32 * 1024, int)  # smaller pages are parsed in a thread
+
+# Search
+SEARCH_EARLY_CUTOFF = get_setting("SEARCH_EARLY_CUTOFF", False, bool)      # over-fetch and stop once NUM_SOURCES articles are usable
+SEARCH_OVERFETCH_FACTOR = get_setting("SEARCH_OVERFETCH_FACTOR", 1.6, float) # candidates requested from SerpAPI per needed article
+SEARCH_DEADLINE_SECONDS = get_setting("SEARCH_DEADLINE_SECONDS", 12.0, float)
+MIN_ARTICLE_CHARS = get_setting("MIN_ARTICLE_CHARS", 400, int)              # shorter bodies are not worth sending downstream
+
+# Per-domain health
+DOMAIN_FAILURE_THRESHOLD = get_setting("DOMAIN_FAILURE_THRESHOLD", 3, int)  # consecutive failures that open a domain's circuit
+DOMAIN_OPEN_SECONDS = get_setting("DOMAIN_OPEN_SECONDS", 15 * 60, int)      # first cool-down; doubles on each failed probe
+DOMAIN_MAX_OPEN_SECONDS = get_setting("DOMAIN_MAX_OPEN_SECONDS", 6 * 60 * 60, int)
+DOMAIN_MIN_TIMEOUT = get_setting("DOMAIN_MIN_TIMEOUT", 4.0, float)
+DOMAIN_EWMA_ALPHA = get_setting("DOMAIN_EWMA_ALPHA", 0.3, float)
+
+# LLM output streaming
+STREAM_LLM_OUTPUT = get_setting("STREAM_LLM_OUTPUT", True, bool)         # relay synthesis/editing tokens as they arrive
+STREAM_FLUSH_INTERVAL = get_setting("STREAM_FLUSH_INTERVAL", 0.15, float) # seconds between delta frames
+STREAM_FLUSH_CHARS = get_setting("STREAM_FLUSH_CHARS", 240, int)          # or sooner once this many chars are buffered
+
+# Source profiling
+PROFILING_MODE = get_setting("PROFILING_MODE", "single")              # "single" prompt or "chunked" map-reduce
+PROFILING_BATCH_CHARS = get_setting("PROFILING_BATCH_CHARS", 24000, int) # target serialized size of one profiler batch
+PROFILING_CONCURRENCY = get_setting("PROFILING_CONCURRENCY", 4, int)
+PROFILING_BATCH_RETRIES = get_setting("PROFILING_BATCH_RETRIES", 2, int)
+
+# Diversity selection
+SELECTION_MODE = get_setting("SELECTION_MODE", "llm")  # "llm" agent or "local" greedy selector; overridable per request
+
+# Near-duplicate detection
+DEDUP_ENABLED = get_setting("DEDUP_ENABLED", True, bool)
+DEDUP_THRESHOLD = get_setting("DEDUP_THRESHOLD", 0.7, float)  # estimated Jaccard similarity above which articles are merged
+DEDUP_SHINGLE_SIZE = get_setting("DEDUP_SHINGLE_SIZE", 5, int) # words per shingle
+DEDUP_NUM_PERM = get_setting("DEDUP_NUM_PERM", 128, int)       # MinHash signature length
+
+# Prompt compaction
+COMPACTION_ENABLED = get_setting("COMPACTION_ENABLED", True, bool)  # trim article content to per-stage token budgets
+
+# Job coalescing
+COALESCE_JOBS = get_setting("COALESCE_JOBS", True, bool)                 # identical concurrent jobs share one pipeline run
+JOB_RESULT_CACHE_SECONDS = get_setting("JOB_RESULT_CACHE_SECONDS", 120, int) # serve repeats of a finished job for this long (0 = off)
+
+# Stage memoization
+STAGE_CACHE_ENABLED = get_setting("STAGE_CACHE_ENABLED", True, bool)  # reuse stage outputs whose exact inputs were seen before
+STAGE_CACHE_TTL = get_setting("STAGE_CACHE_TTL", 6 * 60 * 60, int)
+STAGE_CACHE_MEMORY_ITEMS = get_setting("STAGE_CACHE_MEMORY_ITEMS", 256, int)
+STAGE_CACHE_DISK_BYTES = get_setting("STAGE_CACHE_DISK_BYTES", 128 * 1024 * 1024, int)
+
+# Job checkpoints
+JOB_STORE_BACKEND = get_setting("JOB_STORE_BACKEND", "sqlite")  # "sqlite" or "none"
+JOB_STORE_PATH = get_setting("JOB_STORE_PATH", os.path.join("news_output", "jobs.sqlite3"))
+JOB_RESUME_MAX_AGE = get_setting("JOB_RESUME_MAX_AGE", 30 * 60, int)       # interrupted jobs older than this are not resumed
+JOB_STORE_RETENTION = get_setting("JOB_STORE_RETENTION", 24 * 60 * 60, int) # checkpoints are deleted after this long
+
+# Job scheduling
+SCHEDULER_MAX_CONCURRENT = get_setting("SCHEDULER_MAX_CONCURRENT", 4, int)           # pipelines running at once
+SCHEDULER_MAX_QUEUE = get_setting("SCHEDULER_MAX_QUEUE", 32, int)                     # waiting pipelines before 503
+SCHEDULER_PER_USER_CONCURRENCY = get_setting("SCHEDULER_PER_USER_CONCURRENCY", 2, int)
+SCHEDULER_PER_USER_QUEUE = get_setting("SCHEDULER_PER_USER_QUEUE", 3, int)           # waiting pipelines per user before 429
+SCHEDULER_DISCONNECT_GRACE = get_setting("SCHEDULER_DISCONNECT_GRACE", 30.0, float)  # seconds to wait for a reconnect before cancelling
+# Proxies in front of the app that append to X-Forwarded-For (1 behind a Heroku/Render-style router,
+# 0 when clients connect directly). Anonymous per-user limits key on the address the outermost one saw.
+TRUSTED_PROXY_HOPS = get_setting("TRUSTED_PROXY_HOPS", 1, int)
+
+# Job events
+EVENT_BUS_BACKEND = get_setting("EVENT_BUS_BACKEND", "memory")     # "memory" (single worker) or "redis"
+REDIS_URL = get_setting("REDIS_URL", "redis://localhost:6379/0")
+EVENT_HISTORY_TTL = get_setting("EVENT_HISTORY_TTL", 60 * 60, int)          # seconds a job's events stay replayable after it finishes
+EVENT_HISTORY_MAX_EVENTS = get_setting("EVENT_HISTORY_MAX_EVENTS", 2000, int) # per-job ring buffer size
+
+# Job registry and WebSocket heartbeats
+JOB_REGISTRY_TTL = get_setting("JOB_REGISTRY_TTL", 15 * 60, int)                  # finished jobs are forgotten after this long
+JOB_REGISTRY_MAX_JOBS = get_setting("JOB_REGISTRY_MAX_JOBS", 5000, int)           # hard cap on tracked jobs
+JOB_REGISTRY_SWEEP_SECONDS = get_setting("JOB_REGISTRY_SWEEP_SECONDS", 60, int)
+WS_HEARTBEAT_INTERVAL = get_setting("WS_HEARTBEAT_INTERVAL", 20.0, float)         # seconds between heartbeat messages
+WS_HEARTBEAT_TIMEOUT = get_setting("WS_HEARTBEAT_TIMEOUT", 60.0, float)           # drop clients that answered pings before but went quiet this long
+
+# LLM calls
+LLM_CONCURRENCY = get_setting("LLM_CONCURRENCY", 8, int)              # in-flight chat completions across all jobs
+LLM_MAX_CONNECTIONS = get_setting("LLM_MAX_CONNECTIONS", 16, int)     # shared HTTP pool to the OpenAI API
+LLM_MAX_RETRIES = get_setting("LLM_MAX_RETRIES", 3, int)              # retries on 429, 5xx and connection errors
+LLM_BACKOFF_BASE = get_setting("LLM_BACKOFF_BASE", 0.5, float)        # seconds, doubled per attempt, full jitter
+LLM_BACKOFF_MAX = get_setting("LLM_BACKOFF_MAX", 8.0, float)
+LLM_DEFAULT_DEADLINE = get_setting("LLM_DEFAULT_DEADLINE", 60.0, float) # per-step deadline when a step has none of its own
+
+# Model routing
+FAST_MODEL = get_setting("FAST_MODEL", "gpt-4.1-nano-2025-04-14")  # small model for short tasks and latency fallback
+STAGE_MODELS = {
+    "refine": get_setting("MODEL_REFINE", FAST_MODEL),
+    "profiling": get_setting("MODEL_PROFILING", MODEL),
+    "selection": get_setting("MODEL_SELECTION", FAST_MODEL),
+    "synthesis": get_setting("MODEL_SYNTHESIS", MODEL),
+    "editing": get_setting("MODEL_EDITING", MODEL),
+    "fused": get_setting("MODEL_FUSED", MODEL),
+}
+# p95 latency budget per stage in milliseconds (0 = no budget). Over budget, calls fall back to FAST_MODEL.
+STAGE_LATENCY_BUDGETS_MS = {
+    "refine": get_setting("LATENCY_BUDGET_REFINE_MS", 4000, float),
+    "profiling": get_setting("LATENCY_BUDGET_PROFILING_MS", 45000, float),
+    "selection": get_setting("LATENCY_BUDGET_SELECTION_MS", 8000, float),
+    "synthesis": get_setting("LATENCY_BUDGET_SYNTHESIS_MS", 0, float),
+    "editing": get_setting("LATENCY_BUDGET_EDITING_MS", 0, float),
+    "fused": get_setting("LATENCY_BUDGET_FUSED_MS", 0, float),
+}
+ROUTER_MIN_SAMPLES = get_setting("ROUTER_MIN_SAMPLES", 20, int)      # calls observed before a budget is enforced
+ROUTER_PROBE_RATE = get_setting("ROUTER_PROBE_RATE", 0.1, float)     # share of calls still sent to a slow model to re-measure it
+ROUTER_WINDOW_SECONDS = get_setting("ROUTER_WINDOW_SECONDS", 300.0, float)  # only latencies this recent count towards a budget
+ROUTER_WINDOW_SIZE = get_setting("ROUTER_WINDOW_SIZE", 200, int)          # most recent latencies kept per stage and model
+
+# Query refinement fast path
+REFINE_HEURISTIC = get_setting("REFINE_HEURISTIC", True, bool)         # skip the refiner LLM for topics that are already keyword queries
+REFINE_MAX_KEYWORDS = get_setting("REFINE_MAX_KEYWORDS", 6, int)       # longer topics always go to the refiner
+REFINE_SPECULATIVE = get_setting("REFINE_SPECULATIVE", False, bool)    # query SerpAPI for the raw topic while refining (may cost an extra search)
+
+# Fused synthesis + editing
+# Depth/tone combinations that write the report in one "fused" LLM call instead of synthesizing and then
+# editing, e.g. "1:*" (every depth-1 report) or "1:Sharp & Snappy,2:Gen Z Mode". Empty = always two steps.
+FUSED_REPORT_COMBOS = get_setting("FUSED_REPORT_COMBOS", "")
+
+# Structured outputs
+# Times an unparsable profiler/selector reply is sent back to the model for a JSON fix before the step fails.
+STRUCTURED_REPAIR_RETRIES = get_setting("STRUCTURED_REPAIR_RETRIES", 1, int)
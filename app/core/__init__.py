@@ -0,0 +1,6 @@
+"""
+Pipeline, caching and job-management internals.
+
+The per-worker job state here (JobRegistry, JobScheduler, JobCoalescer, DomainHealthRegistry)
+is only touched from the event loop, so it is not locked.
+"""
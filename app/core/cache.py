@@ -0,0 +1,351 @@
+import os
+import re
+import json
+import hashlib
+import time
+import asyncio
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from urllib.parse import urldefrag
+
+import diskcache
+
+from app.config import (
+    CACHE_DIR,
+    ARTICLE_CACHE_TTL,
+    ARTICLE_CACHE_NEGATIVE_TTL,
+    ARTICLE_CACHE_MEMORY_ITEMS,
+    ARTICLE_CACHE_DISK_BYTES,
+    SERP_CACHE_FRESH_SECONDS,
+    SERP_CACHE_STALE_SECONDS,
+    SERP_CACHE_MEMORY_ITEMS,
+    SERP_CACHE_DISK_BYTES,
+    STAGE_CACHE_ENABLED,
+    STAGE_CACHE_TTL,
+    STAGE_CACHE_MEMORY_ITEMS,
+    STAGE_CACHE_DISK_BYTES,
+)
+from app.core.logger import logger
+from app.core.routing import track_fallbacks
+
+
+class TieredCache:
+    """
+    An in-process LRU in front of a size-bounded on-disk store (diskcache).
+
+    Every entry carries its own expiry so callers can mix long-lived positive results
+    with short-lived negative ones. The memory tier is bounded by item count, the disk
+    tier by bytes. Safe to share between threads. Coroutines use `aget`/`aset`, which serve
+    memory hits on the event loop and run disk reads and writes in a worker thread.
+    """
+
+    def __init__(self, name, directory, memory_items, disk_bytes):
+        self.name = name
+        self._memory = OrderedDict()
+        self._memory_items = memory_items
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0}
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self._disk = diskcache.Cache(directory, size_limit=disk_bytes)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not open {name} cache at {directory}, using memory only: {e}")
+            self._disk = None
+
+    def get(self, key):
+        """Return the cached value for `key`, or None if it is missing or expired."""
+        hit, value = self._get_memory(key)
+        return value if hit else self._get_disk(key)
+
+    async def aget(self, key):
+        hit, value = self._get_memory(key)
+        if hit or self._disk is None:
+            return value if hit else self._get_disk(key)
+        return await asyncio.to_thread(self._get_disk, key)
+
+    def _get_memory(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.time():
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return True, value
+                del self._memory[key]
+        return False, None
+
+    def _get_disk(self, key):
+        now = time.time()
+        entry = None
+        if self._disk is not None:
+            try:
+                entry = self._disk.get(key)
+            except Exception as e:
+                logger.warning(f"⚠️ {self.name} cache read failed for {key}: {e}")
+
+        with self._lock:
+            if entry is not None and entry[0] > now:
+                self._remember(key, entry)
+                self._stats["disk_hits"] += 1
+                return entry[1]
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key, value, ttl):
+        """Store `value` under `key` in both tiers for `ttl` seconds."""
+        self._set_disk(key, self._set_memory(key, value, ttl), ttl)
+
+    async def aset(self, key, value, ttl):
+        entry = self._set_memory(key, value, ttl)
+        if self._disk is not None:
+            await asyncio.to_thread(self._set_disk, key, entry, ttl)
+
+    def _set_memory(self, key, value, ttl):
+        entry = (time.time() + ttl, value)
+        with self._lock:
+            self._remember(key, entry)
+            self._stats["sets"] += 1
+        return entry
+
+    def _set_disk(self, key, entry, ttl):
+        if self._disk is not None:
+            try:
+                self._disk.set(key, entry, expire=ttl)
+            except Exception as e:
+                logger.warning(f"⚠️ {self.name} cache write failed for {key}: {e}")
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._memory_items:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_items"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        if self._disk is not None:
+            try:
+                stats["disk_bytes"] = self._disk.volume()
+            except Exception:
+                pass
+        return stats
+
+
+class ArticleCache(TieredCache):
+    """URL-keyed cache of extracted article text, including recent download failures."""
+
+    def __init__(self):
+        super().__init__(
+            "article",
+            os.path.join(CACHE_DIR, "articles"),
+            ARTICLE_CACHE_MEMORY_ITEMS,
+            ARTICLE_CACHE_DISK_BYTES,
+        )
+        self._negative_hits = 0
+
+    @staticmethod
+    def key(url):
+        return urldefrag(url.strip())[0]
+
+    async def lookup(self, url):
+        """Return `(ok, text)` for a cached URL, or None on a miss."""
+        entry = await self.aget(self.key(url))
+        if entry is not None and not entry[0]:
+            with self._lock:
+                self._negative_hits += 1
+        return entry
+
+    async def store_content(self, url, text):
+        await self.aset(self.key(url), (True, text), ARTICLE_CACHE_TTL)
+
+    async def store_failure(self, url, reason):
+        await self.aset(self.key(url), (False, reason), ARTICLE_CACHE_NEGATIVE_TTL)
+
+    def stats(self):
+        stats = super().stats()
+        stats["negative_hits"] = self._negative_hits
+        return stats
+
+
+def normalize_query(query):
+    """Canonical form of a search query: NFKC, lowercase, no wrapping quotes, single spaces."""
+    query = unicodedata.normalize("NFKC", query or "")
+    query = query.strip().strip("\"'“”‘’").lower()
+    return re.sub(r"\s+", " ", query).strip()
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one call whose result everyone shares."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+class SearchResultCache(TieredCache):
+    """
+    Stale-while-revalidate cache for SerpAPI result lists.
+
+    Results younger than SERP_CACHE_FRESH_SECONDS are served as-is. Older ones are still
+    served, up to SERP_CACHE_STALE_SECONDS, while a single background refresh replaces them.
+    Concurrent misses for the same key share one outbound call.
+    """
+
+    def __init__(self):
+        super().__init__(
+            "serpapi",
+            os.path.join(CACHE_DIR, "serpapi"),
+            SERP_CACHE_MEMORY_ITEMS,
+            SERP_CACHE_DISK_BYTES,
+        )
+        self._flights = SingleFlight()
+
+    def get_or_fetch(self, key, fetch):
+        """Return cached results for `key`, calling `fetch()` (at most once at a time) when needed."""
+        entry = self.get(key)
+        if entry is not None:
+            age = time.time() - entry["fetched_at"]
+            if age < SERP_CACHE_FRESH_SECONDS:
+                return entry["results"]
+            if not self._flights.in_flight(key):
+                logger.debug(f"♻️ Serving stale SerpAPI results ({age:.0f}s old) for {key}, refreshing in background")
+                threading.Thread(target=self._refresh, args=(key, fetch), daemon=True).start()
+            return entry["results"]
+        return self._flights.do(key, lambda: self._fetch_and_store(key, fetch))
+
+    def _fetch_and_store(self, key, fetch):
+        results = fetch()
+        if results:
+            self.set(key, {"fetched_at": time.time(), "results": results}, SERP_CACHE_STALE_SECONDS)
+        return results
+
+    def _refresh(self, key, fetch):
+        try:
+            self._flights.do(key, lambda: self._fetch_and_store(key, fetch))
+        except Exception as e:
+            logger.warning(f"⚠️ Background SerpAPI refresh failed for {key}: {e}")
+
+
+class StageCache(TieredCache):
+    """
+    Content-addressed cache of pipeline stage outputs.
+
+    A stage's key hashes everything that determines its output: the stage name, the agent's
+    model and fully rendered instructions (so focus/depth/tone and prompt edits are covered)
+    and the stage's input payload.
+    """
+
+    def __init__(self):
+        super().__init__(
+            "stage",
+            os.path.join(CACHE_DIR, "stages"),
+            STAGE_CACHE_MEMORY_ITEMS,
+            STAGE_CACHE_DISK_BYTES,
+        )
+
+    @staticmethod
+    def key(stage, agent, payload):
+        material = json.dumps(
+            {"stage": stage, "model": agent.model, "instructions": agent.instructions, "input": payload},
+            sort_keys=True, ensure_ascii=False, default=str,
+        )
+        return f"{stage}:{hashlib.sha256(material.encode()).hexdigest()}"
+
+    async def lookup(self, key):
+        """Cached output for `key`, or None (also when stage caching is disabled)."""
+        if not STAGE_CACHE_ENABLED:
+            return None
+        return await self.aget(key)
+
+    async def memoize(self, key, compute, complete=None):
+        """
+        Return the cached output for `key`, or await `compute()` and cache its result.
+
+        Empty results are never cached, nor are results for which `complete(value)` is false
+        (e.g. profiles missing for some articles), so a transient partial failure is not
+        served to later jobs for the whole TTL. Likewise for results where the router moved
+        any call to the fallback model: the key names the agent's model, not the one that ran.
+        """
+        cached = await self.lookup(key)
+        if cached is not None:
+            logger.info(f"♻️ Reusing cached {key.split(':')[0]} output")
+            return cached
+        with track_fallbacks() as fallbacks:
+            value = await compute()
+        if fallbacks:
+            logger.info(f"🚫 Not caching {key.split(':')[0]} output produced on the fallback model")
+            return value
+        if complete is not None and value and not complete(value):
+            logger.info(f"🚫 Not caching incomplete {key.split(':')[0]} output")
+            return value
+        if STAGE_CACHE_ENABLED and value:
+            await self.aset(key, value, STAGE_CACHE_TTL)
+        return value
+
+
+_article_cache = None
+_article_cache_lock = threading.Lock()
+
+def get_article_cache():
+    """Return the process-wide article cache, creating it on first use."""
+    global _article_cache
+    if _article_cache is None:
+        with _article_cache_lock:
+            if _article_cache is None:
+                _article_cache = ArticleCache()
+    return _article_cache
+
+
+_search_cache = None
+_search_cache_lock = threading.Lock()
+
+def get_search_cache():
+    """Return the process-wide SerpAPI result cache, creating it on first use."""
+    global _search_cache
+    if _search_cache is None:
+        with _search_cache_lock:
+            if _search_cache is None:
+                _search_cache = SearchResultCache()
+    return _search_cache
+
+
+_stage_cache = None
+_stage_cache_lock = threading.Lock()
+
+def get_stage_cache():
+    """Return the process-wide stage output cache, creating it on first use."""
+    global _stage_cache
+    if _stage_cache is None:
+        with _stage_cache_lock:
+            if _stage_cache is None:
+                _stage_cache = StageCache()
+    return _stage_cache
@@ -0,0 +1,97 @@
+import json
+import time
+
+from app.config import JOB_RESULT_CACHE_SECONDS
+from app.core.cache import normalize_query
+from app.core.logger import logger
+
+MIN_RETENTION_SECONDS = 60
+
+
+def job_key(topic, user_preferences):
+    """Coalescing key: normalized topic plus the preferences that change the output."""
+    prefs = {
+        "focus": user_preferences.get("focus", "Just the Facts"),
+        "depth": user_preferences.get("depth", 2),
+        "tone": user_preferences.get("tone", "News with attitude"),
+    }
+    extra = {k: v for k, v in user_preferences.items() if k not in prefs}
+    return json.dumps([normalize_query(topic), prefs, extra], sort_keys=True, default=str)
+
+
+class SharedRun:
+    """One pipeline execution; its events go to the event bus channel named after `primary_job_id`."""
+
+    def __init__(self, key, primary_job_id):
+        self.key = key
+        self.primary_job_id = primary_job_id
+        self.job_ids = {primary_job_id}
+        self.done = False
+        self.succeeded = False
+        self.finished_at = None
+
+
+class JobCoalescer:
+    """
+    Single-flight registry for `/process_news` jobs.
+
+    A job whose key matches a running (or, within JOB_RESULT_CACHE_SECONDS, a successfully
+    finished) run attaches to it instead of starting a new pipeline. Late joiners are
+    replayed the run's event history from the event bus. Coalescing is per worker.
+    """
+
+    def __init__(self, result_ttl=JOB_RESULT_CACHE_SECONDS):
+        self.result_ttl = result_ttl
+        self._by_key = {}
+        self._by_job = {}
+
+    def attach(self, job_id, key):
+        """Return `(run, started)`; `started` is True if the caller must launch the pipeline."""
+        self.evict_expired()
+        run = self._by_key.get(key)
+        if run is not None:
+            run.job_ids.add(job_id)
+            self._by_job[job_id] = run
+            logger.info(f"🔗 Job {job_id} attached to {'finished' if run.done else 'running'} job {run.primary_job_id}")
+            return run, False
+        run = SharedRun(key, job_id)
+        self._by_key[key] = run
+        self._by_job[job_id] = run
+        return run, True
+
+    def run_for(self, job_id):
+        return self._by_job.get(job_id)
+
+    def forget(self, job_id):
+        """Detach a job from its finished run, e.g. before retrying it."""
+        run = self._by_job.pop(job_id, None)
+        if run is not None:
+            run.job_ids.discard(job_id)
+            if self._by_key.get(run.key) is run and run.primary_job_id == job_id:
+                del self._by_key[run.key]
+
+    def finish(self, run, succeeded):
+        run.done = True
+        run.succeeded = succeeded
+        run.finished_at = time.time()
+        if not succeeded or self.result_ttl <= 0:
+            # Never serve a failed run to new requests; they should get a fresh attempt.
+            if self._by_key.get(run.key) is run:
+                del self._by_key[run.key]
+
+    def evict_expired(self):
+        now = time.time()
+        for key, run in list(self._by_key.items()):
+            if run.done and run.finished_at < now - self.result_ttl:
+                del self._by_key[key]
+        # Finished runs stay replayable for at least a minute even with the result cache off.
+        cutoff = now - max(self.result_ttl, MIN_RETENTION_SECONDS)
+        for job_id, run in list(self._by_job.items()):
+            if run.done and run.finished_at < cutoff:
+                del self._by_job[job_id]
+
+    def __len__(self):
+        return len(self._by_job)
+
+
+coalescer = JobCoalescer()
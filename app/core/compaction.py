@@ -0,0 +1,106 @@
+import re
+import json
+
+from app.core.logger import logger
+
+# Token budgets per pipeline stage. "article" caps one article's content, "total" caps all
+# article content in the prompt for a given depth; when the total would be exceeded the
+# per-article cap shrinks evenly.
+STAGE_BUDGETS = {
+    "profiling": {"article": 350, "total": {1: 6000, 2: 6000, 3: 8000}},
+    "synthesis": {"article": 1500, "total": {1: 3500, 2: 6500, 3: 12000}},
+}
+
+MIN_ARTICLE_TOKENS = 120
+LEAD_SENTENCES = 3
+MIN_CUT_CHARS = 80   # shortest tail worth keeping when a later lead sentence has to be cut
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9'“\"])")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {"the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "with", "is", "are", "was", "at", "by", "as", "its", "it", "from", "that", "this"}
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English prose)."""
+    return (len(text) + 3) // 4
+
+
+def dumps_compact(data):
+    """JSON for prompts: no pretty-print whitespace, UTF-8 kept as-is."""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def _sentence_score(sentence, title_terms):
+    words = _WORD_RE.findall(sentence.lower())
+    if not words:
+        return 0.0
+    score = sum(1 for w in words if w in title_terms) / len(words) * 4
+    score += 0.6 * len(re.findall(r"\d", sentence)) ** 0.5   # figures, dates, amounts
+    score += 0.8 if sentence.count("'") >= 2 else 0.0          # quoted statements (clean_text turns " into ')
+    return score
+
+
+def _truncate(text, max_chars):
+    """Cut `text` to at most `max_chars` characters, at a word boundary when there is one nearby."""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max(0, max_chars - 2)]
+    if " " in cut[len(cut) // 2:]:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut + " …"
+
+
+def trim_content(text, title, budget_tokens):
+    """
+    Trim article text to about `budget_tokens`: keep the lead sentences, then add the
+    highest-scoring remaining sentences (title overlap, figures, quotes) in original order.
+    A lead sentence that does not fit (or text with no sentence breaks) is cut to the budget.
+    """
+    if estimate_tokens(text) <= budget_tokens:
+        return text
+    sentences = [s for s in _SENTENCE_RE.split(text) if s]
+    title_terms = {w for w in _WORD_RE.findall(title.lower()) if w not in _STOPWORDS}
+    budget_chars = budget_tokens * 4
+
+    chosen, used = {}, 0
+    for i, sentence in enumerate(sentences[:LEAD_SENTENCES]):
+        remaining = budget_chars - used
+        if len(sentence) > remaining:
+            if not chosen or remaining >= MIN_CUT_CHARS:
+                chosen[i] = _truncate(sentence, remaining)
+            used = budget_chars
+            break
+        chosen[i] = sentence
+        used += len(sentence) + 1
+    ranked = sorted(
+        range(LEAD_SENTENCES, len(sentences)),
+        key=lambda i: (-_sentence_score(sentences[i], title_terms), i),
+    )
+    for i in ranked:
+        if used + len(sentences[i]) > budget_chars:
+            continue
+        chosen[i] = sentences[i]
+        used += len(sentences[i]) + 1
+    return " ".join(chosen[i] for i in sorted(chosen))
+
+
+def compact_articles(articles, stage, depth):
+    """
+    Return `(compacted_articles, tokens_before, tokens_after)` for a stage's prompt.
+
+    Only `content` is trimmed; every other field is passed through unchanged. The token
+    counts compare the old pretty-printed payload with the compact one.
+    """
+    budgets = STAGE_BUDGETS[stage]
+    total_budget = budgets["total"].get(depth, budgets["total"][2])
+    per_article = budgets["article"]
+    if articles:
+        per_article = max(MIN_ARTICLE_TOKENS, min(per_article, total_budget // len(articles)))
+
+    compacted = [
+        {**article, "content": trim_content(article.get("content", ""), article.get("title", ""), per_article)}
+        for article in articles
+    ]
+    before = estimate_tokens(json.dumps(articles, indent=2, ensure_ascii=False))
+    after = estimate_tokens(dumps_compact(compacted))
+    logger.debug(f"✂️ Compacted {stage} input for {len(articles)} articles: ~{before} → ~{after} tokens")
+    return compacted, before, after
@@ -0,0 +1,77 @@
+import re
+import zlib
+
+import numpy as np
+
+from app.config import DEDUP_THRESHOLD, DEDUP_SHINGLE_SIZE, DEDUP_NUM_PERM
+from app.core.logger import logger
+
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+_WORD_RE = re.compile(r"\w+")
+
+
+class MinHasher:
+    """MinHash signatures over word shingles, using seeded universal hashes so results are reproducible."""
+
+    def __init__(self, num_perm=DEDUP_NUM_PERM, shingle_size=DEDUP_SHINGLE_SIZE, seed=1):
+        rng = np.random.default_rng(seed)
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, 2**32 - 1, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2**32 - 1, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text):
+        words = _WORD_RE.findall(text.lower())
+        k = self.shingle_size
+        if len(words) < k:
+            return {" ".join(words)} if words else set()
+        return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+    def signature(self, text):
+        shingles = self.shingles(text)
+        if not shingles:
+            return None
+        hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # (a*x + b) mod p fits in uint64 because a, x < 2**32.
+        permuted = (np.outer(hashes, self._a) + self._b) % _PRIME
+        return permuted.min(axis=0)
+
+    @staticmethod
+    def similarity(sig_a, sig_b):
+        return float(np.mean(sig_a == sig_b))
+
+
+class NearDuplicateFilter:
+    """
+    Incrementally clusters articles whose bodies are near-identical (e.g. wire copies).
+
+    The first article seen in a cluster is its representative. Later members are not kept;
+    instead their source/title/url go into the representative's `alternate_sources`, sorted
+    by URL so the list does not depend on fetch order.
+    """
+
+    def __init__(self, threshold=DEDUP_THRESHOLD, hasher=None):
+        self.threshold = threshold
+        self.hasher = hasher or MinHasher()
+        self._kept = []  # (signature, representative article)
+        self.duplicates = 0
+
+    def add(self, article):
+        """Return True if `article` is new and should be kept, False if it was folded into a cluster."""
+        signature = self.hasher.signature(article.get("content", ""))
+        if signature is None:
+            return True
+        for kept_signature, representative in self._kept:
+            similarity = self.hasher.similarity(signature, kept_signature)
+            if similarity >= self.threshold:
+                alternates = representative.get("alternate_sources", [])
+                alternates.append({
+                    "source": article.get("source", ""),
+                    "title": article.get("title", ""),
+                    "url": article.get("url", ""),
+                })
+                representative["alternate_sources"] = sorted(alternates, key=lambda alt: alt["url"])
+                self.duplicates += 1
+                logger.debug(f"🪞 {article.get('url')} duplicates {representative.get('url')} (~{similarity:.2f})")
+                return False
+        self._kept.append((signature, article))
+        return True
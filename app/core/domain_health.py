@@ -0,0 +1,149 @@
+import time
+from urllib.parse import urlsplit
+
+from app.config import (
+    FETCH_TOTAL_TIMEOUT,
+    DOMAIN_FAILURE_THRESHOLD,
+    DOMAIN_OPEN_SECONDS,
+    DOMAIN_MAX_OPEN_SECONDS,
+    DOMAIN_MIN_TIMEOUT,
+    DOMAIN_EWMA_ALPHA,
+)
+from app.core.logger import logger
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def domain_of(url):
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class DomainStats:
+    """Rolling fetch statistics and circuit state for one publisher domain."""
+
+    def __init__(self, domain):
+        self.domain = domain
+        self.attempts = 0
+        self.successes = 0
+        self.consecutive_failures = 0
+        self.latency_ewma = None
+        self.yield_ewma = None
+        self.state = CLOSED
+        self.opened_at = None
+        self.open_seconds = DOMAIN_OPEN_SECONDS
+        self.probe_in_flight = False
+        self.last_error = None
+
+    def _ewma(self, current, sample):
+        return sample if current is None else DOMAIN_EWMA_ALPHA * sample + (1 - DOMAIN_EWMA_ALPHA) * current
+
+    def as_dict(self):
+        return {
+            "domain": self.domain,
+            "state": self.state,
+            "attempts": self.attempts,
+            "success_rate": round(self.successes / self.attempts, 3) if self.attempts else None,
+            "consecutive_failures": self.consecutive_failures,
+            "latency_ewma": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            "yield_ewma": round(self.yield_ewma, 3) if self.yield_ewma is not None else None,
+            "open_seconds": self.open_seconds if self.state != CLOSED else None,
+            "last_error": self.last_error,
+        }
+
+
+class DomainHealthRegistry:
+    """
+    Tracks per-domain success rate, latency and extraction yield, and drives a circuit breaker.
+
+    A domain's circuit opens after DOMAIN_FAILURE_THRESHOLD consecutive failures (a download
+    that yields no article text counts as a failure). While open, fetches are skipped. After
+    the cool-down one probe is let through (half-open): success closes the circuit, failure
+    re-opens it with a doubled cool-down.
+    """
+
+    def __init__(self):
+        self._domains = {}
+
+    def _stats(self, domain):
+        stats = self._domains.get(domain)
+        if stats is None:
+            stats = self._domains[domain] = DomainStats(domain)
+        return stats
+
+    def allow(self, domain):
+        """Return True if a fetch from `domain` should be attempted now."""
+        stats = self._domains.get(domain)
+        if stats is None or stats.state == CLOSED:
+            return True
+        if stats.state == OPEN and time.time() - stats.opened_at >= stats.open_seconds:
+            stats.state = HALF_OPEN
+            stats.probe_in_flight = False
+        if stats.state == HALF_OPEN and not stats.probe_in_flight:
+            stats.probe_in_flight = True
+            logger.debug(f"🩺 Probing {domain} after {stats.open_seconds}s cool-down")
+            return True
+        return False
+
+    def timeout_for(self, domain):
+        """Adaptive total timeout: a few times the domain's usual latency, capped at FETCH_TOTAL_TIMEOUT."""
+        stats = self._domains.get(domain)
+        if stats is None or stats.latency_ewma is None:
+            return FETCH_TOTAL_TIMEOUT
+        return min(FETCH_TOTAL_TIMEOUT, max(DOMAIN_MIN_TIMEOUT, stats.latency_ewma * 3))
+
+    def priority(self, domain):
+        """Sort key for candidate URLs: healthy, productive domains first."""
+        stats = self._domains.get(domain)
+        if stats is None:
+            return 0.5
+        if stats.state != CLOSED:
+            return 2.0
+        return 1.0 - (stats.yield_ewma if stats.yield_ewma is not None else 0.5)
+
+    def record_success(self, domain, latency):
+        stats = self._stats(domain)
+        stats.attempts += 1
+        stats.successes += 1
+        stats.consecutive_failures = 0
+        stats.latency_ewma = stats._ewma(stats.latency_ewma, latency)
+        stats.yield_ewma = stats._ewma(stats.yield_ewma, 1.0)
+        if stats.state != CLOSED:
+            logger.info(f"✅ Circuit closed for {domain}")
+        stats.state = CLOSED
+        stats.open_seconds = DOMAIN_OPEN_SECONDS
+        stats.probe_in_flight = False
+
+    def record_failure(self, domain, latency, reason, downloaded=False):
+        stats = self._stats(domain)
+        stats.attempts += 1
+        stats.consecutive_failures += 1
+        stats.last_error = reason
+        if latency is not None and downloaded:
+            stats.latency_ewma = stats._ewma(stats.latency_ewma, latency)
+        stats.yield_ewma = stats._ewma(stats.yield_ewma, 0.0)
+        if stats.state == HALF_OPEN:
+            stats.open_seconds = min(stats.open_seconds * 2, DOMAIN_MAX_OPEN_SECONDS)
+            self._open(stats)
+        elif stats.state == CLOSED and stats.consecutive_failures >= DOMAIN_FAILURE_THRESHOLD:
+            self._open(stats)
+
+    def abandon(self, domain):
+        """A fetch was cancelled before finishing; let another request probe a half-open domain."""
+        stats = self._domains.get(domain)
+        if stats is not None and stats.state == HALF_OPEN:
+            stats.probe_in_flight = False
+
+    def _open(self, stats):
+        stats.state = OPEN
+        stats.opened_at = time.time()
+        stats.probe_in_flight = False
+        logger.warning(f"⛔ Circuit opened for {stats.domain} for {stats.open_seconds}s ({stats.last_error})")
+
+    def snapshot(self):
+        return sorted((s.as_dict() for s in self._domains.values()), key=lambda d: (d["state"] == CLOSED, d["domain"]))
+
+
+domain_health = DomainHealthRegistry()
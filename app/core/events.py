@@ -0,0 +1,250 @@
+import json
+import time
+import asyncio
+from collections import deque
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+
+from app.config import EVENT_BUS_BACKEND, REDIS_URL, EVENT_HISTORY_TTL, EVENT_HISTORY_MAX_EVENTS
+from app.core.logger import logger
+
+# Channels of jobs that never call `finish` (e.g. the worker died) are dropped after this long.
+ACTIVE_CHANNEL_TTL = 24 * 60 * 60
+
+
+class EventBus(ABC):
+    """
+    Pub/sub with a per-job event log.
+
+    Events are published to a channel (the job_id of the run producing them) and numbered
+    from 1 in publish order. Each channel keeps the last `max_events` events; `history`
+    returns those after a given seq and `subscribe` yields `(seq, event)` pairs published
+    after subscribing. Subscribers read history after subscribing and drop live events with
+    a seq they have already seen, so nothing is lost or repeated in between. Once a job
+    calls `finish`, its log stays replayable for `ttl` seconds. Other job_ids can be
+    aliased to a channel so coalesced jobs follow the run they attached to.
+    """
+
+    @abstractmethod
+    async def publish(self, channel, event):
+        """Append `event` to the channel's log and deliver it to subscribers; returns its seq."""
+        ...
+
+    @abstractmethod
+    async def history(self, channel, after_seq=0):
+        ...
+
+    @abstractmethod
+    def subscribe(self, channel):
+        ...
+
+    @abstractmethod
+    async def finish(self, channel):
+        """Start the channel's retention countdown. Publishing again restarts it."""
+        ...
+
+    @abstractmethod
+    async def listener_count(self, channel):
+        ...
+
+    @abstractmethod
+    async def alias(self, job_id, channel):
+        ...
+
+    @abstractmethod
+    async def resolve(self, job_id):
+        """Channel carrying `job_id`'s events; the job_id itself unless it was aliased."""
+        ...
+
+    async def close(self):
+        pass
+
+
+class _ChannelLog:
+    def __init__(self, max_events):
+        self.events = deque(maxlen=max_events)
+        self.last_seq = 0
+        self.updated = time.time()
+        self.finished_at = None
+
+
+class InMemoryEventBus(EventBus):
+    """Process-local bus. Only correct with a single worker."""
+
+    def __init__(self, ttl=EVENT_HISTORY_TTL, max_events=EVENT_HISTORY_MAX_EVENTS):
+        self.ttl = ttl
+        self.max_events = max_events
+        self._logs = {}
+        self._subscribers = {}
+        self._aliases = {}
+
+    async def publish(self, channel, event):
+        self._evict_expired()
+        log = self._logs.get(channel)
+        if log is None:
+            log = self._logs[channel] = _ChannelLog(self.max_events)
+        log.last_seq += 1
+        log.events.append((log.last_seq, event))
+        log.updated = time.time()
+        log.finished_at = None
+        for queue in self._subscribers.get(channel, ()):
+            queue.put_nowait((log.last_seq, event))
+        return log.last_seq
+
+    async def history(self, channel, after_seq=0):
+        log = self._logs.get(channel)
+        if log is None:
+            return []
+        return [(seq, event) for seq, event in log.events if seq > after_seq]
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(channel, set()).add(queue)
+
+        async def messages():
+            while True:
+                yield await queue.get()
+
+        try:
+            yield messages()
+        finally:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    async def finish(self, channel):
+        log = self._logs.get(channel)
+        if log is not None:
+            log.finished_at = time.time()
+
+    async def listener_count(self, channel):
+        return len(self._subscribers.get(channel, ()))
+
+    async def alias(self, job_id, channel):
+        if job_id == channel:
+            self._aliases.pop(job_id, None)
+        else:
+            self._aliases[job_id] = (channel, time.time())
+
+    async def resolve(self, job_id):
+        alias = self._aliases.get(job_id)
+        return alias[0] if alias else job_id
+
+    def _evict_expired(self):
+        now = time.time()
+        for channel, log in list(self._logs.items()):
+            if log.finished_at is not None:
+                expired = log.finished_at < now - self.ttl
+            else:
+                expired = log.updated < now - ACTIVE_CHANNEL_TTL
+            if expired and channel not in self._subscribers:
+                del self._logs[channel]
+        for job_id, (channel, created) in list(self._aliases.items()):
+            if channel not in self._logs and created < now - self.ttl:
+                del self._aliases[job_id]
+
+
+class RedisEventBus(EventBus):
+    """
+    Redis-backed bus shared by every worker: the log is a capped list of `{"seq", "event"}`
+    entries with a counter for seqs, live events go over pub/sub and aliases are plain keys.
+    """
+
+    def __init__(self, url=REDIS_URL, ttl=EVENT_HISTORY_TTL, max_events=EVENT_HISTORY_MAX_EVENTS):
+        import redis.asyncio as redis  # only needed when this backend is selected
+
+        self.ttl = ttl
+        self.max_events = max_events
+        self._redis = redis.from_url(url, decode_responses=True)
+
+    @staticmethod
+    def _keys(channel):
+        return f"news:events:{channel}", f"news:seq:{channel}", f"news:live:{channel}"
+
+    async def publish(self, channel, event):
+        log_key, seq_key, live_key = self._keys(channel)
+        seq = await self._redis.incr(seq_key)
+        payload = json.dumps({"seq": seq, "event": event}, ensure_ascii=False)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(log_key, payload)
+            pipe.ltrim(log_key, -self.max_events, -1)
+            pipe.expire(log_key, ACTIVE_CHANNEL_TTL)
+            pipe.expire(seq_key, ACTIVE_CHANNEL_TTL)
+            pipe.publish(live_key, payload)
+            await pipe.execute()
+        return seq
+
+    async def history(self, channel, after_seq=0):
+        log_key, _, _ = self._keys(channel)
+        entries = [json.loads(item) for item in await self._redis.lrange(log_key, 0, -1)]
+        return [(entry["seq"], entry["event"]) for entry in entries if entry["seq"] > after_seq]
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        _, _, live_key = self._keys(channel)
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(live_key)
+
+        async def messages():
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                entry = json.loads(message["data"])
+                yield entry["seq"], entry["event"]
+
+        try:
+            yield messages()
+        finally:
+            await pubsub.unsubscribe(live_key)
+            await pubsub.aclose()
+
+    async def finish(self, channel):
+        log_key, seq_key, _ = self._keys(channel)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.expire(log_key, self.ttl)
+            pipe.expire(seq_key, self.ttl)
+            await pipe.execute()
+
+    async def listener_count(self, channel):
+        _, _, live_key = self._keys(channel)
+        counts = await self._redis.pubsub_numsub(live_key)
+        return counts[0][1] if counts else 0
+
+    async def alias(self, job_id, channel):
+        if job_id == channel:
+            await self._redis.delete(f"news:alias:{job_id}")
+        else:
+            await self._redis.set(f"news:alias:{job_id}", channel, ex=ACTIVE_CHANNEL_TTL)
+
+    async def resolve(self, job_id):
+        return await self._redis.get(f"news:alias:{job_id}") or job_id
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+_event_bus = None
+
+def get_event_bus():
+    """Return the configured event bus, creating it on first use."""
+    global _event_bus
+    if _event_bus is None:
+        if EVENT_BUS_BACKEND == "redis":
+            try:
+                _event_bus = RedisEventBus()
+            except ImportError:
+                logger.error("❌ EVENT_BUS_BACKEND=redis but the redis package is not installed, using the in-memory bus")
+                _event_bus = InMemoryEventBus()
+        else:
+            _event_bus = InMemoryEventBus()
+    return _event_bus
+
+
+async def close_event_bus():
+    global _event_bus
+    if _event_bus is not None:
+        await _event_bus.close()
+        _event_bus = None
@@ -0,0 +1,172 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import aiohttp
+import trafilatura
+
+from app.config import (
+    FETCH_MAX_CONNECTIONS,
+    FETCH_MAX_PER_HOST,
+    FETCH_CONNECT_TIMEOUT,
+    FETCH_READ_TIMEOUT,
+    FETCH_TOTAL_TIMEOUT,
+    FETCH_MAX_BYTES,
+    FETCH_USER_AGENT,
+    EXTRACTION_EXECUTOR,
+    EXTRACTION_PROCESS_WORKERS,
+    EXTRACTION_MAX_TASKS_PER_CHILD,
+    EXTRACTION_INLINE_MAX_BYTES,
+)
+from app.core.logger import logger
+
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain", "")
+
+
+class FetchError(Exception):
+    """Raised when a page cannot be downloaded; the message is safe to surface as a failure reason."""
+
+
+def trafilatura_extractor(html, url):
+    """Default extractor: main article text via trafilatura, or None if nothing was found."""
+    return trafilatura.extract(html, url=url, include_comments=False, include_tables=False)
+
+
+class ExtractionPool:
+    """
+    Bounded process pool for CPU-bound HTML extraction, so lxml parsing does not hold the GIL
+    the event loop needs.
+
+    Workers are recycled after EXTRACTION_MAX_TASKS_PER_CHILD documents, and at most two
+    documents per worker are queued at once. If the pool breaks, it is rebuilt on next use.
+    """
+
+    def __init__(self, workers=EXTRACTION_PROCESS_WORKERS, max_tasks_per_child=EXTRACTION_MAX_TASKS_PER_CHILD):
+        self.workers = max(1, workers)
+        self.max_tasks_per_child = max_tasks_per_child
+        self._executor = None
+        self._slots = asyncio.Semaphore(self.workers * 2)
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=self.max_tasks_per_child,
+            )
+        return self._executor
+
+    async def run(self, fn, *args):
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(self._get_executor(), fn, *args)
+            except BrokenProcessPool:
+                logger.error("🚨 Extraction process pool broke, rebuilding it")
+                self.shutdown()
+                raise
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class ArticleFetcher:
+    """
+    Async article downloader shared by every job in the process.
+
+    One aiohttp session (and so one keep-alive pool) serves all jobs. The connector enforces
+    the global and per-host connection caps, bodies are streamed and cut off at
+    FETCH_MAX_BYTES, and extraction is delegated to a pluggable `extractor(html, url)`.
+
+    With `executor="process"` pages larger than EXTRACTION_INLINE_MAX_BYTES are extracted in
+    an ExtractionPool; the extractor must then be a picklable module-level function.
+    """
+
+    def __init__(self, extractor=trafilatura_extractor, executor=EXTRACTION_EXECUTOR):
+        self.extractor = extractor
+        self._pool = ExtractionPool() if executor == "process" else None
+        self._session = None
+        self._session_lock = asyncio.Lock()
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            async with self._session_lock:
+                if self._session is None or self._session.closed:
+                    connector = aiohttp.TCPConnector(
+                        limit=FETCH_MAX_CONNECTIONS,
+                        limit_per_host=FETCH_MAX_PER_HOST,
+                        ttl_dns_cache=300,
+                    )
+                    timeout = aiohttp.ClientTimeout(
+                        total=FETCH_TOTAL_TIMEOUT,
+                        sock_connect=FETCH_CONNECT_TIMEOUT,
+                        sock_read=FETCH_READ_TIMEOUT,
+                    )
+                    self._session = aiohttp.ClientSession(
+                        connector=connector,
+                        timeout=timeout,
+                        headers={"User-Agent": FETCH_USER_AGENT, "Accept": "text/html,application/xhtml+xml"},
+                    )
+        return self._session
+
+    async def download(self, url, timeout=None):
+        """Return the raw page body as bytes, raising FetchError on any failure."""
+        session = await self._get_session()
+        request_timeout = None
+        if timeout is not None:
+            request_timeout = aiohttp.ClientTimeout(
+                total=timeout,
+                sock_connect=min(FETCH_CONNECT_TIMEOUT, timeout),
+                sock_read=min(FETCH_READ_TIMEOUT, timeout),
+            )
+        try:
+            async with session.get(url, allow_redirects=True, timeout=request_timeout) as response:
+                if response.status >= 400:
+                    raise FetchError(f"HTTP {response.status}")
+                content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                if content_type not in HTML_CONTENT_TYPES:
+                    raise FetchError(f"Unsupported content type {content_type}")
+                body = bytearray()
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    body.extend(chunk)
+                    if len(body) >= FETCH_MAX_BYTES:
+                        logger.debug(f"✂️ Truncated {url} at {FETCH_MAX_BYTES} bytes")
+                        del body[FETCH_MAX_BYTES:]
+                        break
+                return bytes(body)
+        except asyncio.TimeoutError:
+            raise FetchError("Timeout")
+        except aiohttp.ClientError as e:
+            raise FetchError(type(e).__name__)
+
+    async def extract(self, html, url):
+        if self._pool is not None and len(html) > EXTRACTION_INLINE_MAX_BYTES:
+            try:
+                return await self._pool.run(self.extractor, html, url)
+            except BrokenProcessPool:
+                pass
+        return await asyncio.to_thread(self.extractor, html, url)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self._pool is not None:
+            self._pool.shutdown()
+
+
+_fetcher = None
+
+def get_fetcher():
+    """Return the process-wide article fetcher."""
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = ArticleFetcher()
+    return _fetcher
+
+async def close_fetcher():
+    if _fetcher is not None:
+        await _fetcher.close()
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+from app.config import JOB_STORE_BACKEND, JOB_STORE_PATH, JOB_STORE_RETENTION
+from app.core.logger import logger
+
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobStore(ABC):
+    """
+    Interface for durable job checkpoints.
+
+    A job is created with its inputs, each pipeline stage's output is saved as soon as the
+    stage completes, and the job's status moves between running, completed, failed and cancelled. `load` returns
+    everything needed to resume from the last completed stage.
+    """
+
+    @abstractmethod
+    def create(self, job_id, topic, user_preferences):
+        ...
+
+    @abstractmethod
+    def save_stage(self, job_id, stage, output):
+        ...
+
+    @abstractmethod
+    def set_status(self, job_id, status):
+        ...
+
+    @abstractmethod
+    def load(self, job_id):
+        """Return `{"job_id", "topic", "user_preferences", "status", "updated_at", "stages"}` or None."""
+        ...
+
+    @abstractmethod
+    def interrupted(self, max_age):
+        """
+        Claim and return jobs still marked running, updated within `max_age` seconds, whose
+        owning process is gone. Each job is claimed by exactly one caller.
+        """
+        ...
+
+
+class NullJobStore(JobStore):
+    """Keeps nothing; used when checkpoints are disabled."""
+
+    def create(self, job_id, topic, user_preferences):
+        pass
+
+    def save_stage(self, job_id, stage, output):
+        pass
+
+    def set_status(self, job_id, status):
+        pass
+
+    def load(self, job_id):
+        return None
+
+    def interrupted(self, max_age):
+        return []
+
+
+class SQLiteJobStore(JobStore):
+    """Local SQLite job store. Fine for a single host; swap in a networked store for several."""
+
+    def __init__(self, path=JOB_STORE_PATH, retention=JOB_STORE_RETENTION):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self.retention = retention
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY, topic TEXT NOT NULL, user_preferences TEXT NOT NULL,"
+                " status TEXT NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            try:
+                # Stores created before jobs recorded the process running them.
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+            except sqlite3.OperationalError:
+                pass
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_stages ("
+                " job_id TEXT NOT NULL, stage TEXT NOT NULL, output TEXT NOT NULL, saved_at REAL NOT NULL,"
+                " PRIMARY KEY (job_id, stage))"
+            )
+        self._purge()
+
+    def create(self, job_id, topic, user_preferences):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (job_id, topic, user_preferences, status, created_at, updated_at, owner)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, topic, json.dumps(user_preferences), RUNNING, now, now, os.getpid()),
+            )
+
+    def save_stage(self, job_id, stage, output):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_stages VALUES (?, ?, ?, ?)",
+                (job_id, stage, json.dumps(output, ensure_ascii=False), now),
+            )
+            self._conn.execute("UPDATE jobs SET updated_at = ? WHERE job_id = ?", (now, job_id))
+            self._conn.execute("COMMIT")
+
+    def set_status(self, job_id, status):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, updated_at = ? WHERE job_id = ?",
+                (status, os.getpid(), time.time(), job_id),
+            )
+
+    def load(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT topic, user_preferences, status, updated_at FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            stages = self._conn.execute(
+                "SELECT stage, output FROM job_stages WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        return {
+            "job_id": job_id,
+            "topic": row[0],
+            "user_preferences": json.loads(row[1]),
+            "status": row[2],
+            "updated_at": row[3],
+            "stages": {stage: json.loads(output) for stage, output in stages},
+        }
+
+    def interrupted(self, max_age):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id, owner FROM jobs WHERE status = ? AND updated_at >= ?", (RUNNING, time.time() - max_age)
+            ).fetchall()
+            claimed = []
+            for job_id, owner in rows:
+                if owner != os.getpid() and _process_alive(owner):
+                    continue  # still running in a sibling worker
+                # Compare-and-swap on the owner so concurrently starting workers claim each job once.
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET owner = ? WHERE job_id = ? AND owner IS ?", (os.getpid(), job_id, owner)
+                )
+                if cursor.rowcount == 1:
+                    claimed.append(job_id)
+        return [self.load(job_id) for job_id in claimed]
+
+    def _purge(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            self._conn.execute("DELETE FROM job_stages WHERE job_id IN (SELECT job_id FROM jobs WHERE updated_at < ?)", (cutoff,))
+            deleted = self._conn.execute("DELETE FROM jobs WHERE updated_at < ?", (cutoff,)).rowcount
+        if deleted:
+            logger.info(f"🧹 Purged {deleted} old job checkpoints")
+
+
+def _process_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_job_store = None
+
+def get_job_store():
+    """Return the configured job store, creating it on first use."""
+    global _job_store
+    if _job_store is None:
+        if JOB_STORE_BACKEND == "sqlite":
+            try:
+                _job_store = SQLiteJobStore()
+            except Exception as e:
+                logger.error(f"❌ Could not open job store at {JOB_STORE_PATH}, checkpoints disabled: {e}")
+                _job_store = NullJobStore()
+        else:
+            _job_store = NullJobStore()
+    return _job_store
@@ -0,0 +1,181 @@
+import time
+import random
+import asyncio
+
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError
+
+from app.config import (
+    OPENAI_API_KEY,
+    LLM_CONCURRENCY,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE,
+    LLM_BACKOFF_MAX,
+    LLM_DEFAULT_DEADLINE,
+)
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.core.routing import router, latency_metric
+
+# Wall-clock budget per pipeline step, covering queueing for a slot, every attempt and backoff.
+STEP_DEADLINES = {
+    "refine": 20,
+    "profiling": 90,
+    "selection": 45,
+    "synthesis": 120,
+    "editing": 120,
+    "fused": 150,
+}
+
+
+class LLMError(Exception):
+    """Raised when an LLM step fails after its retries or runs past its deadline."""
+
+
+_client = None
+_semaphore = None
+
+def get_llm_client():
+    """Shared AsyncOpenAI client; all calls reuse one pooled HTTP connection set."""
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            max_retries=0,  # retries are handled here, with jitter and the step deadline in mind
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+                timeout=httpx.Timeout(max(STEP_DEADLINES.values()), connect=10.0),
+            ),
+        )
+    return _client
+
+
+async def close_llm_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+    return _semaphore
+
+
+def _is_retryable(error):
+    if isinstance(error, (APIConnectionError, APITimeoutError)):
+        return True
+    return isinstance(error, APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+
+def _backoff(error, attempt):
+    """Full-jitter exponential backoff, stretched to the server's Retry-After when it sends one."""
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return max(delay, min(LLM_BACKOFF_MAX, float(retry_after))) if retry_after else delay
+    except ValueError:
+        return delay
+
+
+def agent_messages(agent, messages):
+    """The agent's instructions as the system message, followed by the conversation."""
+    instructions = agent.instructions() if callable(agent.instructions) else agent.instructions
+    return [{"role": "system", "content": instructions}, *messages]
+
+
+def _record_usage(step, model, usage, started):
+    latency_ms = (time.monotonic() - started) * 1000
+    metrics.observe(f"llm.{step}.latency_ms", latency_ms)
+    metrics.observe(latency_metric(step, model), latency_ms)
+    router.record(step, model, latency_ms)
+    metrics.incr(f"llm.{step}.calls")
+    if usage is None:
+        logger.info(f"🤖 {step} on {model}: {latency_ms:.0f}ms")
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None) or 0
+    for prefix in ("llm", f"llm.{step}", f"llm.{step}.{model}"):
+        metrics.incr(f"{prefix}.prompt_tokens", usage.prompt_tokens)
+        metrics.incr(f"{prefix}.cached_tokens", cached_tokens)
+        metrics.incr(f"{prefix}.completion_tokens", usage.completion_tokens)
+    logger.info(f"🤖 {step} on {model}: {latency_ms:.0f}ms, {usage.prompt_tokens} prompt "
+                f"({cached_tokens} cached) + {usage.completion_tokens} completion tokens")
+
+
+async def _complete(agent, model, messages):
+    response = await get_llm_client().chat.completions.create(
+        model=model, messages=agent_messages(agent, messages)
+    )
+    return response.choices[0].message.content or "", response.usage
+
+
+async def _stream(agent, model, messages, on_delta, emitted):
+    stream = await get_llm_client().chat.completions.create(
+        model=model,
+        messages=agent_messages(agent, messages),
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    parts = []
+    usage = None
+    async for chunk in stream:
+        if chunk.usage is not None:
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+        content = chunk.choices[0].delta.content
+        if content:
+            parts.append(content)
+            emitted[0] = True
+            await on_delta(content)
+    return "".join(parts), usage
+
+
+async def run_agent(agent, messages, step, on_delta=None):
+    """
+    Run one chat completion for `agent` and return the assistant's text.
+
+    The model is the agent's, unless the router moves an over-budget step to the fast
+    model. Waits for a global LLM slot, retries 429/5xx/connection errors with jittered backoff
+    and gives up with LLMError once the step's deadline (STEP_DEADLINES) has passed. With
+    `on_delta`, the completion is streamed and `on_delta(text)` awaited per chunk; a stream
+    that already produced text is not retried, since the client has seen part of it.
+    """
+    deadline = STEP_DEADLINES.get(step, LLM_DEFAULT_DEADLINE)
+    model = router.choose(step, agent.model)
+    emitted = [False]
+
+    async def attempts():
+        for attempt in range(1 + LLM_MAX_RETRIES):
+            queued = time.monotonic()
+            async with _get_semaphore():
+                metrics.observe("llm.queue_ms", (time.monotonic() - queued) * 1000)
+                started = time.monotonic()
+                try:
+                    if on_delta is None:
+                        content, usage = await _complete(agent, model, messages)
+                    else:
+                        content, usage = await _stream(agent, model, messages, on_delta, emitted)
+                    _record_usage(step, model, usage, started)
+                    return content
+                except Exception as e:
+                    metrics.incr(f"llm.{step}.errors")
+                    if attempt == LLM_MAX_RETRIES or not _is_retryable(e) or emitted[0]:
+                        raise
+                    delay = _backoff(e, attempt)
+                    logger.warning(f"⚠️ LLM {step} attempt {attempt + 1} failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                    metrics.incr("llm.retries")
+            await asyncio.sleep(delay)
+
+    try:
+        return await asyncio.wait_for(attempts(), deadline)
+    except asyncio.TimeoutError:
+        metrics.incr(f"llm.{step}.timeouts")
+        raise LLMError(f"{step} did not finish within {deadline}s")
+    except Exception as e:
+        raise LLMError(f"{step} failed: {e}") from e
@@ -0,0 +1,58 @@
+import threading
+from collections import deque
+
+
+class Metrics:
+    """
+    Minimal in-process metrics: monotonically increasing counters plus observations with
+    a bounded window for percentiles. Served by the debug endpoint; not a replacement for
+    a real metrics backend.
+    """
+
+    def __init__(self, window=500):
+        self._lock = threading.Lock()
+        self._window = window
+        self._counters = {}
+        self._observations = {}
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        with self._lock:
+            series = self._observations.get(name)
+            if series is None:
+                series = self._observations[name] = {"count": 0, "sum": 0.0, "recent": deque(maxlen=self._window)}
+            series["count"] += 1
+            series["sum"] += value
+            series["recent"].append(value)
+
+    def percentile(self, name, pct):
+        """Percentile over the recent window of `name`, or None if nothing was observed."""
+        with self._lock:
+            series = self._observations.get(name)
+            if not series or not series["recent"]:
+                return None
+            ordered = sorted(series["recent"])
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            names = list(self._observations)
+        observations = {}
+        for name in names:
+            with self._lock:
+                series = self._observations[name]
+                count, total = series["count"], series["sum"]
+            observations[name] = {
+                "count": count,
+                "mean": round(total / count, 3) if count else None,
+                "p50": self.percentile(name, 50),
+                "p95": self.percentile(name, 95),
+            }
+        return {"counters": counters, "observations": observations}
+
+
+metrics = Metrics()
@@ -7,11 +7,24 @@ from app.agents.agent_factory import (
     create_source_profiler_agent,
     create_diversity_selector_agent,
     create_debate_synthesizer_agent,
-    create_creative_editor_agent
+    create_creative_editor_agent,
+    create_fused_report_agent,
+    uses_fused_report,
 )
-from swarm import Swarm
+from app.agents.prompts import TONES
 from app.core.logger import logger
-from app.core.utils import search_news
+from app.core.utils import search_news, SearchError
+from app.core.streaming import DeltaBatcher
+from app.core.llm import run_agent
+from app.core.structured import run_structured, parse_profiles, parse_selected_ids, OutputParseError
+from app.core.profiling import profile_articles
+from app.core.selection import select_diverse, resolve_selected_ids
+from app.core.compaction import compact_articles, dumps_compact
+from app.core.metrics import metrics
+from app.core.cache import get_stage_cache, normalize_query
+from app.core.refine import refine_topic
+from app.core.job_store import get_job_store
+from app.config import STREAM_LLM_OUTPUT, PROFILING_MODE, SELECTION_MODE, COMPACTION_ENABLED
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
@@ -36,7 +49,9 @@ class Report(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     final_report_data: AgentDetails
 
-client = Swarm()
+def article_set(items):
+    """Order-independent form of a list of articles/profiles, for stage cache keys."""
+    return sorted(items, key=lambda item: str(item.get("id", "")))
 
 async def process_news_backend(job_id, topic, user_preferences, websocket_sender, supabase_client):
     """Run the news processing workflow, using a websocket to stream results."""
@@ -47,10 +62,30 @@ async def process_news_backend(job_id, topic, user_preferences, websocket_sender
     focus = user_preferences.get("focus", "Just the Facts")
     depth = user_preferences.get("depth", 2)
     tone = user_preferences.get("tone", "News with attitude")
-    if tone not in ["Grandma Mode", "News with attitude", "Gen Z Mode", "Sharp & Snappy"]:
+    if tone not in TONES:
         tone = "News with attitude"
+    selection_mode = user_preferences.get("selection_mode", SELECTION_MODE)
+    fused = user_preferences.get("fused_report")
+    if fused is None:
+        fused = uses_fused_report(depth, tone)
+    to_prompt_json = dumps_compact if COMPACTION_ENABLED else (lambda data: json.dumps(data, indent=2))
+    tokens_saved = 0
+
+    def compact_for(stage, articles):
+        nonlocal tokens_saved
+        if not COMPACTION_ENABLED:
+            return articles
+        compacted, before, after = compact_articles(articles, stage, depth)
+        tokens_saved += before - after
+        return compacted
     
     os.makedirs("news_output", exist_ok=True)
+    stage_cache = get_stage_cache()
+    job_store = get_job_store()
+    checkpoint = await asyncio.to_thread(job_store.load, job_id)
+    stages = checkpoint["stages"] if checkpoint else {}
+    if stages:
+        logger.info(f"♻️ Resuming job {job_id} after stages: {', '.join(stages)}")
 
     # Step 1: Refine Search Query
     try:
@@ -58,13 +93,18 @@ async def process_news_backend(job_id, topic, user_preferences, websocket_sender
         await notify({"step": "search", "status": "running", "message": "🔍 Refining search query..."})
         search_agent_instance = create_search_agent()
         refine_start_time = time.time()
-        search_response = await asyncio.to_thread(
-            client.run,
-            agent=search_agent_instance,
-            messages=[{"role": "user", "content": topic}]
-        )
+
+        async def refine():
+            content = await run_agent(search_agent_instance, [{"role": "user", "content": topic}], "refine")
+            return content.strip().strip('"')
+
+        speculative = None
+        if "refine" in stages:
+            refined_topic = stages["refine"]
+        else:
+            refined_topic, speculative = await refine_topic(topic, search_agent_instance, refine)
+            await asyncio.to_thread(job_store.save_stage, job_id, "refine", refined_topic)
         refine_duration = time.time() - refine_start_time
-        refined_topic = search_response.messages[-1]["content"].strip().strip('"')
         logger.debug(f"🤖 Search query refined in {refine_duration:.2f} seconds. New query: {refined_topic}")
         logger.debug(f"Checking if topics are identical: {refined_topic.lower() == topic.lower()}")
 
@@ -72,20 +112,46 @@ async def process_news_backend(job_id, topic, user_preferences, websocket_sender
         logger.info(f"🔍 Calling search_news function with refined topic: {refined_topic}")
         await notify({"step": "search", "status": "running", "message": f"🔍 Searching for: {refined_topic}", "refined_topic": refined_topic})
         search_start_time = time.time()
-        raw_news_json = await asyncio.to_thread(search_news, refined_topic)
-        search_duration = time.time() - search_start_time
-        logger.debug(f"✅ search_news function execution took {search_duration:.2f} seconds.")
-        
+        raw_news_list = []
         try:
-            raw_news_list = json.loads(raw_news_json)
-        except json.JSONDecodeError:
-            logger.error(f"Failed to decode JSON from search_news output: {raw_news_json}")
+            if "search" in stages:
+                raw_news_list = stages["search"]
+                for article in raw_news_list:
+                    await notify({"step": "search", "status": "article", "data": article})
+            else:
+                async def collect(query, news_results=None):
+                    async for article in search_news(query, news_results):
+                        raw_news_list.append(article)
+                        if len(raw_news_list) == 1:
+                            logger.debug(f"⚡ First article ready after {time.time() - search_start_time:.2f} seconds.")
+                        await notify({"step": "search", "status": "article", "data": article})
+
+                if speculative is not None and normalize_query(refined_topic) == normalize_query(topic):
+                    # The refiner kept the topic, so the speculative results are exactly what we need.
+                    await collect(refined_topic, await speculative)
+                    speculative = None
+                else:
+                    try:
+                        await collect(refined_topic)
+                    except SearchError as e:
+                        if speculative is None:
+                            raise
+                        logger.warning(f"⚠️ Search for refined topic failed, trying the raw topic's results: {e}")
+                if not raw_news_list and speculative is not None:
+                    logger.info(f"🔁 Nothing usable for '{refined_topic}', falling back to the raw topic's results")
+                    refined_topic = topic.strip()
+                    await collect(refined_topic, await speculative)
+                    await asyncio.to_thread(job_store.save_stage, job_id, "refine", refined_topic)
+        except SearchError as e:
+            logger.error(f"Search provider failed for topic {refined_topic}: {e}")
             await notify({
                 "step": "search", 
                 "status": "error", 
                  "message": f"We're having trouble understanding the search results. This might be a temporary issue with the news provider. Please try a different topic or try again later."
             })
             return False
+        search_duration = time.time() - search_start_time
+        logger.debug(f"✅ search_news function execution took {search_duration:.2f} seconds.")
 
         if not raw_news_list:
             logger.warning(f"No articles found for topic: {refined_topic}")
@@ -97,7 +163,9 @@ async def process_news_backend(job_id, topic, user_preferences, websocket_sender
             return False
             
         logger.info(f"Found {len(raw_news_list)} articles.")
-        await notify({"step": "search", "status": "completed", "data": raw_news_list, "refined_topic": refined_topic})
+        if "search" not in stages:
+            await asyncio.to_thread(job_store.save_stage, job_id, "search", raw_news_list)
+        await notify({"step": "search", "status": "completed", "count": len(raw_news_list), "refined_topic": refined_topic})
     except Exception as e:
         logger.exception("Error in Search step")
         await notify({"step": "error", "message": f"The news search encountered an unexpected problem. This could be a network issue or a problem with the search service. Please check your internet connection and try again."
@@ -108,14 +176,27 @@ async def process_news_backend(job_id, topic, user_preferences, websocket_sender
     try:
         logger.info("🧠 Running Source Profiler Agent...")
         await notify({"step": "profiling", "status": "running", "message": "🧠 Profiling sources..."})
+        profiling_articles = compact_for("profiling", raw_news_list)
         source_profiler_agent_instance = create_source_profiler_agent(focus)
-        profiler_message = f"Profile these articles:\n{json.dumps(raw_news_list, indent=2)}"
-        profile_response = await asyncio.to_thread(
-            client.run,
-            agent=source_profiler_agent_instance,
-            messages=[{"role": "user", "content": profiler_message}]
-        )
-        profiling_output = json.loads(profile_response.messages[-1]["content"])
+
+        async def profile():
+            if PROFILING_MODE == "chunked":
+                return await profile_articles(focus, profiling_articles)
+            profiler_message = f"Profile these articles:\n{to_prompt_json(profiling_articles)}"
+            return await run_structured(
+                source_profiler_agent_instance, [{"role": "user", "content": profiler_message}], "profiling", parse_profiles
+            )
+
+        if "profiling" in stages:
+            profiling_output = stages["profiling"]
+        else:
+            profiling_output = await stage_cache.memoize(
+                stage_cache.key("profiling", source_profiler_agent_instance, [PROFILING_MODE, article_set(profiling_articles)]),
+                profile,
+                # Batches that gave up or dropped invalid profiles leave articles out; don't pin that.
+                complete=lambda profiles: {p.get("id") for p in profiles} >= {a["id"] for a in profiling_articles},
+            )
+            await asyncio.to_thread(job_store.save_stage, job_id, "profiling", profiling_output)
         await notify({"step": "profiling", "status": "completed", "data": profiling_output})
     except Exception as e:
         logger.exception("Error in Profiling step")
@@ -126,34 +207,71 @@ async def process_news_backend(job_id, topic, user_preferences, websocket_sender
     try:
         logger.info("🧮 Running Diversity Selector Agent...")
         await notify({"step": "selection", "status": "running", "message": "🧮 Selecting diverse articles..."})
-        diversity_selector_agent_instance = create_diversity_selector_agent(focus, depth)
-        diversity_message = f"Select a diverse subset from these profiles: {json.dumps(profiling_output, indent=2)}"
-        diversity_response = await asyncio.to_thread(
-            client.run,
-            agent=diversity_selector_agent_instance,
-            messages=[{"role": "user", "content": diversity_message}]
-        )
-        selected_ids = json.loads(diversity_response.messages[-1]["content"])
-        selected_articles = [a for a in raw_news_list if a["id"] in selected_ids]
+        if "selection" in stages:
+            selected_articles = stages["selection"]
+        elif selection_mode == "local":
+            selected_articles = resolve_selected_ids(select_diverse(profiling_output, depth), raw_news_list)
+        else:
+            diversity_selector_agent_instance = create_diversity_selector_agent(focus, depth)
+
+            async def select():
+                diversity_message = f"Select a diverse subset from these profiles: {to_prompt_json(profiling_output)}"
+                return await run_structured(
+                    diversity_selector_agent_instance, [{"role": "user", "content": diversity_message}], "selection", parse_selected_ids
+                )
+
+            try:
+                selected_ids = await stage_cache.memoize(
+                    stage_cache.key("selection", diversity_selector_agent_instance, article_set(profiling_output)), select
+                )
+            except OutputParseError as e:
+                logger.warning(f"⚠️ Diversity Selector output unusable ({e}), falling back to the local selector")
+                selected_ids = []
+            selected_articles = resolve_selected_ids(selected_ids, raw_news_list)
+            if not selected_articles:
+                logger.warning("⚠️ Diversity Selector returned no known IDs, falling back to the local selector")
+                selected_articles = resolve_selected_ids(select_diverse(profiling_output, depth), raw_news_list)
         logger.info(f"Selected {len(selected_articles)} articles.")
+        if "selection" not in stages:
+            await asyncio.to_thread(job_store.save_stage, job_id, "selection", selected_articles)
         await notify({"step": "selection", "status": "completed", "data": selected_articles})
     except Exception as e:
         logger.exception("Error in Selection step")
         await notify({"step": "error", "message": f"Selection failed: {e}"})
         return False
 
-    # Step 5: Synthesize Debate
+    # Step 5: Synthesize Debate (fused mode also does the creative edit in the same call)
     try:
-        logger.info("🗣️ Running Debate Synthesizer Agent...")
+        # Fused reports are written by one agent in one call, checkpointed and cached as the "fused" stage
+        synthesis_stage = "fused" if fused else "synthesis"
+        logger.info(f"🗣️ Running {'Fused Synthesizer + Editor' if fused else 'Debate Synthesizer'} Agent...")
         await notify({"step": "synthesis", "status": "running", "message": "🗣️ Synthesizing the debate..."})
-        debate_synthesizer_agent_instance = create_debate_synthesizer_agent(focus, depth)
-        debate_response = await asyncio.to_thread(
-            client.run,
-            agent=debate_synthesizer_agent_instance,
-            messages=[{"role": "user", "content": f"Create a debate report:\n{json.dumps(selected_articles, indent=2)}"}]
-        )
-        final_report = debate_response.messages[-1]["content"]
-        await notify({"step": "synthesis", "status": "completed", "data": final_report})
+        if fused:
+            debate_synthesizer_agent_instance = create_fused_report_agent(focus, depth, tone)
+        else:
+            debate_synthesizer_agent_instance = create_debate_synthesizer_agent(focus, depth)
+        synthesis_articles = compact_for("synthesis", selected_articles)
+        synthesis_messages = [{"role": "user", "content": f"Create a debate report:\n{to_prompt_json(synthesis_articles)}"}]
+
+        async def synthesize():
+            if STREAM_LLM_OUTPUT:
+                batcher = DeltaBatcher(notify, "synthesis")
+                report = await run_agent(debate_synthesizer_agent_instance, synthesis_messages, synthesis_stage, batcher.add)
+                await batcher.flush()
+                return report
+            return await run_agent(debate_synthesizer_agent_instance, synthesis_messages, synthesis_stage)
+
+        if synthesis_stage in stages:
+            final_report = stages[synthesis_stage]
+        else:
+            final_report = await stage_cache.memoize(
+                stage_cache.key(synthesis_stage, debate_synthesizer_agent_instance, article_set(synthesis_articles)), synthesize
+            )
+            await asyncio.to_thread(job_store.save_stage, job_id, synthesis_stage, final_report)
+        await notify({"step": "synthesis", "status": "completed", "data": final_report, "fused": fused})
+        if COMPACTION_ENABLED:
+            logger.info(f"✂️ Prompt compaction saved ~{tokens_saved} input tokens for job {job_id}")
+            metrics.observe("compaction.tokens_saved", tokens_saved)
     except Exception as e:
         logger.exception("Error in Synthesis step")
         await notify({"step": "error", "message": f"Synthesis failed: {e}"})
@@ -164,16 +282,29 @@ async def process_news_backend(job_id, topic, user_preferences, websocket_sender
         logger.info("🎨 Running Creative Editor Agent...")
         await notify({"step": "editing", "status": "running", "message": "🎨 Applying a creative touch..."})
         creative_editor_agent_instance = create_creative_editor_agent(focus, depth, tone)
-        creative_response = await asyncio.to_thread(
-            client.run,
-            agent=creative_editor_agent_instance,
-            messages=[{"role": "user", "content": f"Rewrite this report:\n{final_report}"}]
-        )
-        creative_report = creative_response.messages[-1]["content"]
+        editing_messages = [{"role": "user", "content": f"Rewrite this report:\n{final_report}"}]
+
+        async def edit():
+            if STREAM_LLM_OUTPUT:
+                batcher = DeltaBatcher(notify, "editing")
+                report = await run_agent(creative_editor_agent_instance, editing_messages, "editing", batcher.add)
+                await batcher.flush()
+                return report
+            return await run_agent(creative_editor_agent_instance, editing_messages, "editing")
+
+        if fused:
+            creative_report = final_report  # already edited in the fused synthesis call
+            metrics.incr("report.fused")
+        else:
+            creative_report = await stage_cache.memoize(
+                stage_cache.key("editing", creative_editor_agent_instance, final_report), edit
+            )
+        await asyncio.to_thread(job_store.save_stage, job_id, "editing", creative_report)
         
         final_report_data = {
             "topic": topic,
             "refined_topic": refined_topic,
+            "fused": fused,
             "agent_details": {
                 "search": raw_news_list,
                 "profiling": profiling_output,
@@ -191,6 +322,5 @@ async def process_news_backend(job_id, topic, user_preferences, websocket_sender
         await notify({"step": "error", "message": f"Editing failed: {e}"})
         return False
         
-    await asyncio.sleep(1) # Add a small delay to ensure the last message is sent
     return True
 
@@ -0,0 +1,81 @@
+import json
+import math
+import asyncio
+
+from app.agents.agent_factory import create_source_profiler_agent
+from app.config import PROFILING_BATCH_CHARS, PROFILING_CONCURRENCY, PROFILING_BATCH_RETRIES
+from app.core.compaction import dumps_compact
+from app.core.logger import logger
+from app.core.structured import run_structured, parse_profiles
+
+
+class ProfilingError(Exception):
+    """Raised when no batch of articles could be profiled."""
+
+
+def make_batches(articles, max_chars=PROFILING_BATCH_CHARS):
+    """
+    Split articles into size-balanced batches of roughly `max_chars` serialized characters.
+
+    Largest articles are placed first, each into the currently lightest batch, so batch
+    sizes (and therefore profiler latencies) stay close to each other.
+    """
+    sizes = [(len(json.dumps(a, ensure_ascii=False)), a) for a in articles]
+    total = sum(size for size, _ in sizes)
+    num_batches = max(1, min(len(articles), math.ceil(total / max_chars)))
+    batches = [[] for _ in range(num_batches)]
+    loads = [0] * num_batches
+    for size, article in sorted(sizes, key=lambda pair: pair[0], reverse=True):
+        lightest = loads.index(min(loads))
+        batches[lightest].append(article)
+        loads[lightest] += size
+    return [batch for batch in batches if batch]
+
+
+async def _profile_batch(agent, batch, index, semaphore):
+    expected_ids = {a["id"] for a in batch}
+    message = f"Profile these articles:\n{dumps_compact(batch)}"
+    last_error = None
+    for attempt in range(1 + PROFILING_BATCH_RETRIES):
+        async with semaphore:
+            try:
+                profiles = await run_structured(agent, [{"role": "user", "content": message}], "profiling", parse_profiles)
+                returned_ids = {p["id"] for p in profiles}
+                missing = expected_ids - returned_ids
+                if missing:
+                    raise ValueError(f"profiles missing for {len(missing)} of {len(expected_ids)} articles")
+                return [p for p in profiles if p["id"] in expected_ids]
+            except Exception as e:
+                last_error = e
+                logger.warning(f"⚠️ Profiling batch {index} attempt {attempt + 1} failed: {e}")
+    logger.error(f"🚨 Giving up on profiling batch {index} ({len(batch)} articles): {last_error}")
+    return None
+
+
+async def profile_articles(focus, articles):
+    """
+    Profile articles in concurrent, size-balanced batches and merge the results.
+
+    Unparsable output is first repaired (see run_structured); a batch is retried on its own
+    if it still fails or misses any of its IDs.
+    Profiles are returned in the original article order, one per known ID; articles whose
+    batch kept failing are left out. Raises ProfilingError if every batch failed.
+    """
+    batches = make_batches(articles)
+    logger.info(f"🧠 Profiling {len(articles)} articles in {len(batches)} batches")
+    agent = create_source_profiler_agent(focus)
+    semaphore = asyncio.Semaphore(PROFILING_CONCURRENCY)
+    results = await asyncio.gather(*(
+        _profile_batch(agent, batch, i, semaphore) for i, batch in enumerate(batches)
+    ))
+
+    by_id = {}
+    for profiles in results:
+        for profile in profiles or []:
+            by_id.setdefault(profile["id"], profile)
+    if not by_id:
+        raise ProfilingError("every profiling batch failed")
+    merged = [by_id[a["id"]] for a in articles if a["id"] in by_id]
+    if len(merged) < len(articles):
+        logger.warning(f"⚠️ Profiled {len(merged)} of {len(articles)} articles; the rest are excluded from selection")
+    return merged
@@ -0,0 +1,75 @@
+import re
+import asyncio
+
+from app.config import REFINE_HEURISTIC, REFINE_MAX_KEYWORDS, REFINE_SPECULATIVE
+from app.core.cache import get_stage_cache, normalize_query
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.core.utils import search_results
+
+# Words that mark a conversational request the refiner should rewrite, not a keyword query.
+CONVERSATIONAL_WORDS = {
+    "what", "whats", "what's", "who", "whos", "who's", "how", "why", "when", "where", "which",
+    "tell", "show", "give", "find", "me", "my", "i", "i'm", "im", "we", "you", "your",
+    "want", "know", "let", "lets", "let's", "please", "can", "could", "would", "should",
+    "latest", "news", "recent", "recently", "update", "updates", "happening", "going", "lately",
+    "about", "any", "anything", "some", "see", "said", "say", "says", "think", "that", "this",
+}
+_WORD_RE = re.compile(r"[\w'’&.+-]+", re.UNICODE)
+
+
+def is_keyword_query(topic):
+    """True if `topic` already reads like a search query: a few keywords, no question or chatter."""
+    text = (topic or "").strip().strip("\"'“”")
+    if not text or any(ch in text for ch in "?!\n"):
+        return False
+    words = _WORD_RE.findall(text)
+    if not words or len(words) > REFINE_MAX_KEYWORDS:
+        return False
+    if sum(len(word) for word in words) < 0.8 * len(re.sub(r"[\s,]", "", text)):
+        return False  # mostly symbols
+    return not any(word.lower().replace("’", "'") in CONVERSATIONAL_WORDS for word in words)
+
+
+def _consume_result(task):
+    # A speculative search nobody ended up awaiting must not log "exception never retrieved".
+    if not task.cancelled():
+        task.exception()
+
+
+async def refine_topic(topic, agent, refine):
+    """
+    Return `(refined_topic, speculative)` for a job's topic.
+
+    Tries, in order: the stage cache keyed on the normalized topic, the keyword heuristic
+    (the topic is used as is) and finally `refine()`, the refiner LLM call. In the last case
+    with REFINE_SPECULATIVE on, SerpAPI is queried for the raw topic in the meantime and
+    `speculative` is that asyncio task, for the caller to use if the refined query turns out
+    the same or finds nothing; otherwise it is None. If the refiner fails, the raw topic is used.
+    """
+    stage_cache = get_stage_cache()
+    normalized = normalize_query(topic)
+    key = stage_cache.key("refine", agent, normalized)
+
+    cached = await stage_cache.lookup(key)
+    if cached is not None:
+        metrics.incr("refine.cache_hits")
+        logger.info(f"♻️ Reusing cached refinement for: {topic}")
+        return cached, None
+    if REFINE_HEURISTIC and is_keyword_query(topic):
+        metrics.incr("refine.skipped")
+        logger.info(f"⚡ Topic is already a keyword query, skipping refinement: {topic}")
+        return topic.strip().strip("\"'“”"), None
+
+    speculative = None
+    if REFINE_SPECULATIVE:
+        speculative = asyncio.create_task(search_results(topic))
+        speculative.add_done_callback(_consume_result)
+    metrics.incr("refine.llm_calls")
+    try:
+        refined = await stage_cache.memoize(key, refine)
+    except Exception as e:
+        logger.warning(f"⚠️ Query refinement failed, searching for the topic as given: {e}")
+        metrics.incr("refine.failures")
+        refined = topic.strip()
+    return refined or topic.strip(), speculative
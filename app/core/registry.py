@@ -0,0 +1,132 @@
+import time
+
+from app.config import JOB_REGISTRY_TTL, JOB_REGISTRY_MAX_JOBS
+from app.core.job_store import COMPLETED, FAILED, CANCELLED
+from app.core.logger import logger
+from app.core.metrics import metrics
+
+QUEUED = "queued"
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class RegistryFull(Exception):
+    """Raised when the registry is at its hard cap and nothing can be evicted."""
+
+
+class JobRecord:
+    def __init__(self, job_id, owner, state):
+        self.job_id = job_id
+        self.owner = owner
+        self.state = state
+        self.created_at = time.time()
+        self.finished_at = time.time() if state in FINISHED_STATES else None
+        self.connections = 0
+        self.last_seen = None
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+
+class JobRegistry:
+    """
+    Every job this worker knows about: state, owner, start time and open WebSockets.
+
+    Finished jobs are evicted `ttl` seconds after they finish. At the `max_jobs` cap the
+    oldest finished jobs make room; if every job is still active, `register` raises RegistryFull.
+    """
+
+    def __init__(self, ttl=JOB_REGISTRY_TTL, max_jobs=JOB_REGISTRY_MAX_JOBS):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._jobs = {}
+
+    def register(self, job_id, owner, state=QUEUED):
+        if job_id not in self._jobs and len(self._jobs) >= self.max_jobs:
+            self.evict_expired()
+            if len(self._jobs) >= self.max_jobs:
+                self._evict_oldest_finished()
+            if len(self._jobs) >= self.max_jobs:
+                metrics.incr("registry.rejected")
+                raise RegistryFull(f"tracking {len(self._jobs)} active jobs")
+        record = self._jobs.get(job_id)
+        if record is None:
+            record = self._jobs[job_id] = JobRecord(job_id, owner, state)
+        else:
+            record.owner = owner if owner is not None else record.owner
+            self.set_state(job_id, state)
+        return record
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def discard(self, job_id):
+        self._jobs.pop(job_id, None)
+
+    def set_state(self, job_id, state):
+        record = self._jobs.get(job_id)
+        if record is None:
+            return
+        record.state = state
+        record.finished_at = time.time() if state in FINISHED_STATES else None
+
+    def connected(self, job_id):
+        record = self._jobs.get(job_id)
+        if record is not None:
+            record.connections += 1
+            record.last_seen = time.time()
+
+    def seen(self, job_id):
+        record = self._jobs.get(job_id)
+        if record is not None:
+            record.last_seen = time.time()
+
+    def disconnected(self, job_id):
+        record = self._jobs.get(job_id)
+        if record is not None:
+            record.connections = max(0, record.connections - 1)
+
+    def evict_expired(self):
+        cutoff = time.time() - self.ttl
+        expired = [
+            job_id for job_id, record in self._jobs.items()
+            if record.finished and record.finished_at < cutoff and not record.connections
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if expired:
+            metrics.incr("registry.evicted", len(expired))
+            logger.debug(f"🧹 Evicted {len(expired)} finished jobs from the registry")
+        return len(expired)
+
+    def _evict_oldest_finished(self):
+        finished = sorted((r for r in self._jobs.values() if r.finished), key=lambda r: r.finished_at)
+        for record in finished[:max(1, len(finished) // 10)]:
+            del self._jobs[record.job_id]
+            metrics.incr("registry.evicted_at_cap")
+
+    def stats(self):
+        now = time.time()
+        by_state = {}
+        ages = []
+        for record in self._jobs.values():
+            by_state[record.state] = by_state.get(record.state, 0) + 1
+            ages.append(now - record.created_at)
+        ages.sort()
+
+        def pct(p):
+            return round(ages[min(len(ages) - 1, int(len(ages) * p / 100))], 1) if ages else None
+
+        return {
+            "size": len(self._jobs),
+            "max_jobs": self.max_jobs,
+            "by_state": by_state,
+            "connections": sum(r.connections for r in self._jobs.values()),
+            "age_seconds": {"p50": pct(50), "p90": pct(90), "p99": pct(99), "max": round(ages[-1], 1) if ages else None},
+        }
+
+    def __len__(self):
+        return len(self._jobs)
+
+
+registry = JobRegistry()
@@ -0,0 +1,124 @@
+import time
+import random
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+from app.config import (
+    FAST_MODEL,
+    STAGE_MODELS,
+    STAGE_LATENCY_BUDGETS_MS,
+    ROUTER_MIN_SAMPLES,
+    ROUTER_PROBE_RATE,
+    ROUTER_WINDOW_SECONDS,
+    ROUTER_WINDOW_SIZE,
+)
+from app.core.logger import logger
+from app.core.metrics import metrics
+
+
+_fallbacks = contextvars.ContextVar("router_fallbacks", default=None)
+
+
+def latency_metric(step, model):
+    return f"llm.{step}.{model}.latency_ms"
+
+
+@contextmanager
+def track_fallbacks():
+    """
+    Yield a set that collects every step sent to the fallback model inside the block,
+    including from tasks started there (they share the set through their copied context).
+    """
+    token = _fallbacks.set(set())
+    try:
+        yield _fallbacks.get()
+    finally:
+        _fallbacks.reset(token)
+
+
+class ModelRouter:
+    """
+    Picks the model for each LLM call.
+
+    A step runs on its configured model unless that model's p95 latency for the step over
+    the last `window_seconds` exceeds the step's budget, in which case calls go to
+    `fallback`. A share of calls (`probe_rate`) keeps going to the configured model so it
+    is re-measured; the slow samples age out of the window, so the step switches back
+    within about `window_seconds` once the model is within budget again.
+    """
+
+    def __init__(self, budgets=STAGE_LATENCY_BUDGETS_MS, fallback=FAST_MODEL,
+                 min_samples=ROUTER_MIN_SAMPLES, probe_rate=ROUTER_PROBE_RATE,
+                 window_seconds=ROUTER_WINDOW_SECONDS, window_size=ROUTER_WINDOW_SIZE):
+        self.budgets = budgets
+        self.fallback = fallback
+        self.min_samples = min_samples
+        self.probe_rate = probe_rate
+        self.window_seconds = window_seconds
+        self.window_size = window_size
+        self._degraded = set()
+        self._samples = {}  # (step, model) -> deque of (time, latency_ms)
+
+    def record(self, step, model, latency_ms):
+        samples = self._samples.get((step, model))
+        if samples is None:
+            samples = self._samples[(step, model)] = deque(maxlen=self.window_size)
+        samples.append((time.monotonic(), latency_ms))
+
+    def p95(self, step, model):
+        """p95 latency of `model` for `step` over the window, or None below `min_samples` calls."""
+        cutoff = time.monotonic() - self.window_seconds
+        recent = sorted(ms for at, ms in self._samples.get((step, model), ()) if at >= cutoff)
+        if len(recent) < self.min_samples:
+            return None
+        return recent[min(len(recent) - 1, int(len(recent) * 0.95))]
+
+    def choose(self, step, model):
+        budget = self.budgets.get(step)
+        if not budget or model == self.fallback:
+            return model
+        p95 = self.p95(step, model)
+        if p95 is None or p95 <= budget:
+            if step in self._degraded:
+                self._degraded.discard(step)
+                logger.info(f"🚦 {step} back on {model} (p95 {p95 or 0:.0f}ms within {budget:.0f}ms)")
+            return model
+        if step not in self._degraded:
+            self._degraded.add(step)
+            logger.warning(f"🚦 {step} p95 on {model} is {p95:.0f}ms, over its {budget:.0f}ms budget; falling back to {self.fallback}")
+        if random.random() < self.probe_rate:
+            return model
+        metrics.incr(f"router.{step}.fallback")
+        tracked = _fallbacks.get()
+        if tracked is not None:
+            tracked.add(step)
+        return self.fallback
+
+    def stats(self):
+        """Per-stage routing state and per-model latency/token numbers for tuning."""
+        snapshot = metrics.snapshot()
+        counters, observations = snapshot["counters"], snapshot["observations"]
+        stages = {}
+        for step, model in STAGE_MODELS.items():
+            stages[step] = {
+                "model": model,
+                "budget_ms": self.budgets.get(step) or None,
+                "fallback_active": step in self._degraded,
+                "window_p95_ms": self.p95(step, model),
+                "fallback_calls": counters.get(f"router.{step}.fallback", 0),
+                "models": {
+                    used: {
+                        "latency_ms": observations.get(latency_metric(step, used)),
+                        "prompt_tokens": counters.get(f"llm.{step}.{used}.prompt_tokens", 0),
+                        "cached_tokens": counters.get(f"llm.{step}.{used}.cached_tokens", 0),
+                        "completion_tokens": counters.get(f"llm.{step}.{used}.completion_tokens", 0),
+                    }
+                    for used in {model, self.fallback}
+                    if latency_metric(step, used) in observations
+                },
+            }
+        return stages
+
+
+router = ModelRouter()
@@ -0,0 +1,158 @@
+import math
+import time
+import asyncio
+from contextlib import asynccontextmanager
+
+from app.config import (
+    SCHEDULER_MAX_CONCURRENT,
+    SCHEDULER_MAX_QUEUE,
+    SCHEDULER_PER_USER_CONCURRENCY,
+    SCHEDULER_PER_USER_QUEUE,
+)
+from app.core.logger import logger
+from app.core.metrics import metrics
+
+DEFAULT_JOB_SECONDS = 30.0
+MAX_RETRY_AFTER = 300
+
+
+class SchedulerFull(Exception):
+    """Raised when a job cannot be admitted. `status_code` is 429 (per user) or 503 (global)."""
+
+    def __init__(self, message, status_code, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class _Entry:
+    def __init__(self, job_id, user):
+        self.job_id = job_id
+        self.user = user
+        self.task = None
+        self.started = False
+        self.cancelled = False
+        self.wakeup = asyncio.Event()
+        self.submitted_at = time.time()
+        self.started_at = None
+
+
+class JobScheduler:
+    """
+    Admission control for pipeline runs.
+
+    At most `max_concurrent` runs execute at once, and at most `per_user` for one user; the
+    rest wait in a FIFO queue. `submit` rejects outright when the global queue or the
+    user's share of it is full, so a spike is turned away instead of slowing every job
+    down. A `user` of None (resumed jobs) is exempt from the per-user limits.
+    """
+
+    def __init__(self, max_concurrent=SCHEDULER_MAX_CONCURRENT, max_queue=SCHEDULER_MAX_QUEUE,
+                 per_user=SCHEDULER_PER_USER_CONCURRENCY, per_user_queue=SCHEDULER_PER_USER_QUEUE):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.per_user = per_user
+        self.per_user_queue = per_user_queue
+        self._queue = []
+        self._running = {}
+        self._entries = {}
+        self._avg_seconds = DEFAULT_JOB_SECONDS
+
+    def submit(self, job_id, user):
+        """Reserve a place for `job_id`, starting it right away if there is capacity."""
+        if user is not None:
+            waiting = sum(1 for e in self._queue if e.user == user)
+            if waiting >= self.per_user_queue and not self._can_start(user):
+                metrics.incr("scheduler.rejected_user")
+                raise SchedulerFull("Too many jobs for this client", 429, self.retry_after(waiting + 1))
+        if len(self._queue) >= self.max_queue and len(self._running) >= self.max_concurrent:
+            metrics.incr("scheduler.rejected_full")
+            raise SchedulerFull("Server is busy", 503, self.retry_after(len(self._queue) + 1))
+        entry = _Entry(job_id, user)
+        self._entries[job_id] = entry
+        self._queue.append(entry)
+        self._pump()
+        return entry
+
+    @asynccontextmanager
+    async def slot(self, entry, on_position=None):
+        """Wait for `entry`'s turn (reporting queue positions) and release it on exit."""
+        entry.task = asyncio.current_task()
+        try:
+            if entry.cancelled:
+                raise asyncio.CancelledError()
+            last = None
+            while not entry.started:
+                position = self._queue.index(entry) + 1
+                if on_position and position != last:
+                    await on_position(position)
+                    last = position
+                entry.wakeup.clear()
+                if entry.started:
+                    break
+                await entry.wakeup.wait()
+            metrics.observe("scheduler.wait_seconds", entry.started_at - entry.submitted_at)
+            yield
+        finally:
+            self._release(entry)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job. Returns False if the scheduler does not know it."""
+        entry = self._entries.get(job_id)
+        if entry is None:
+            return False
+        entry.cancelled = True
+        if entry.task is not None:
+            entry.task.cancel()
+        logger.info(f"🛑 Cancelled job {job_id} ({'running' if entry.started else 'queued'})")
+        metrics.incr("scheduler.cancelled")
+        return True
+
+    def retry_after(self, queued):
+        """Seconds until roughly `queued` more jobs would have started."""
+        waves = math.ceil(queued / max(1, self.max_concurrent))
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(waves * self._avg_seconds)))
+
+    def stats(self):
+        return {
+            "running": len(self._running),
+            "queued": len(self._queue),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "avg_job_seconds": round(self._avg_seconds, 1),
+        }
+
+    def _can_start(self, user):
+        if len(self._running) >= self.max_concurrent:
+            return False
+        if user is None:
+            return True
+        return sum(1 for e in self._running.values() if e.user == user) < self.per_user
+
+    def _pump(self):
+        changed = False
+        for entry in list(self._queue):
+            if len(self._running) >= self.max_concurrent:
+                break
+            if self._can_start(entry.user):
+                self._queue.remove(entry)
+                self._running[entry.job_id] = entry
+                entry.started = True
+                entry.started_at = time.time()
+                changed = True
+        if changed:
+            for entry in list(self._queue) + list(self._running.values()):
+                entry.wakeup.set()
+
+    def _release(self, entry):
+        self._entries.pop(entry.job_id, None)
+        if entry in self._queue:
+            self._queue.remove(entry)
+            for waiting in self._queue:
+                waiting.wakeup.set()
+        elif self._running.pop(entry.job_id, None) is not None and not entry.cancelled:
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.time() - entry.started_at)
+        self._pump()
+
+
+scheduler = JobScheduler()
@@ -0,0 +1,91 @@
+import numpy as np
+
+from app.agents.prompts import DEPTH_SELECTION_COUNTS
+from app.core.logger import logger
+
+# Relative weight of each profile field in the feature space. Perspective tags carry the
+# most signal about what an article adds to the debate.
+FIELD_WEIGHTS = {"perspective": 2.0, "tone": 1.0, "source_type": 0.8, "region": 0.8}
+DIVERSITY_WEIGHT = 1.0
+
+
+def _values(profile, field):
+    value = profile.get(field)
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list):
+        return []
+    return sorted({str(v).strip().lower() for v in value if str(v).strip()})
+
+
+def encode_profiles(profiles):
+    """
+    Encode profiles as weighted one-hot/multi-hot feature vectors.
+
+    Returns `(matrix, features)` where `features[j]` is the `(field, value)` of column j.
+    Each field block is normalised so a profile with five perspective tags does not
+    outweigh one with two.
+    """
+    features = sorted({(field, v) for p in profiles for field in FIELD_WEIGHTS for v in _values(p, field)})
+    column = {feature: j for j, feature in enumerate(features)}
+    matrix = np.zeros((len(profiles), len(features)))
+    for i, profile in enumerate(profiles):
+        for field, weight in FIELD_WEIGHTS.items():
+            values = _values(profile, field)
+            for v in values:
+                matrix[i, column[(field, v)]] = weight / len(values)
+    return matrix, features
+
+
+def select_diverse(profiles, depth):
+    """
+    Deterministically pick `DEPTH_SELECTION_COUNTS[depth]` profile IDs.
+
+    Greedy max-coverage with a max-marginal-diversity term: each step takes the profile
+    that covers the most not-yet-covered feature weight, plus its distance to the closest
+    already-selected profile. Ties go to the earlier profile.
+    """
+    target = DEPTH_SELECTION_COUNTS.get(depth, DEPTH_SELECTION_COUNTS[2])
+    profiles = [p for p in profiles if isinstance(p, dict) and p.get("id")]
+    if len(profiles) <= target:
+        return [p["id"] for p in profiles]
+
+    matrix, _ = encode_profiles(profiles)
+    covered = np.zeros(matrix.shape[1])
+    min_distance = np.full(len(profiles), np.inf)
+    available = np.ones(len(profiles), dtype=bool)
+    selected = []
+    for _ in range(target):
+        coverage_gain = np.maximum(matrix - covered, 0).sum(axis=1)
+        diversity = np.where(np.isinf(min_distance), 0.0, min_distance)
+        scores = np.where(available, coverage_gain + DIVERSITY_WEIGHT * diversity, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        covered = np.maximum(covered, matrix[best])
+        min_distance = np.minimum(min_distance, np.linalg.norm(matrix - matrix[best], axis=1))
+    return [profiles[i]["id"] for i in selected]
+
+
+def resolve_selected_ids(selected_ids, articles):
+    """
+    Map selector output back to articles, tolerating case/whitespace/quote drift in the IDs.
+
+    Returns the matched articles in their original order. Unknown IDs are logged instead
+    of silently disappearing.
+    """
+    if not isinstance(selected_ids, list):
+        raise ValueError(f"selector returned {type(selected_ids).__name__}, expected a list of IDs")
+    by_id = {a["id"]: a for a in articles}
+    by_normalized = {a["id"].strip().lower(): a for a in articles}
+    matched, unknown = set(), []
+    for raw_id in selected_ids:
+        key = str(raw_id)
+        article = by_id.get(key) or by_normalized.get(key.strip().strip("\"'").lower())
+        if article is None:
+            unknown.append(key)
+        else:
+            matched.add(article["id"])
+    if unknown:
+        logger.warning(f"⚠️ Selector returned {len(unknown)} unknown article IDs: {unknown}")
+    return [a for a in articles if a["id"] in matched]
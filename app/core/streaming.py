@@ -0,0 +1,41 @@
+import time
+
+from app.config import STREAM_FLUSH_INTERVAL, STREAM_FLUSH_CHARS
+
+
+class DeltaBatcher:
+    """
+    Coalesces LLM token deltas into `{step}/delta` WebSocket frames.
+
+    A frame is sent once STREAM_FLUSH_CHARS characters are buffered or STREAM_FLUSH_INTERVAL
+    seconds have passed since the last one, so the client gets a steady trickle of text
+    instead of one frame per token.
+    """
+
+    def __init__(self, notify, step, interval=STREAM_FLUSH_INTERVAL, max_chars=STREAM_FLUSH_CHARS):
+        self.notify = notify
+        self.step = step
+        self.interval = interval
+        self.max_chars = max_chars
+        self._buffer = []
+        self._buffered_chars = 0
+        self._last_flush = time.monotonic()
+        self.frames = 0
+
+    async def add(self, text):
+        if not text:
+            return
+        self._buffer.append(text)
+        self._buffered_chars += len(text)
+        if self._buffered_chars >= self.max_chars or time.monotonic() - self._last_flush >= self.interval:
+            await self.flush()
+
+    async def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        text = "".join(self._buffer)
+        self._buffer = []
+        self._buffered_chars = 0
+        self.frames += 1
+        await self.notify({"step": self.step, "status": "delta", "data": text})
@@ -0,0 +1,161 @@
+import re
+import json
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+from app.config import STRUCTURED_REPAIR_RETRIES
+from app.core.llm import run_agent
+from app.core.logger import logger
+from app.core.metrics import metrics
+
+_FENCE_RE = re.compile(r"```[a-zA-Z]*\s*(.*?)```", re.DOTALL)
+
+REPAIR_PROMPT = (
+    "Your previous reply could not be used: {error}\n"
+    "Reply again with only the corrected JSON, in the format your instructions ask for. "
+    "No explanations, no markdown, no code fences."
+)
+
+
+class OutputParseError(ValueError):
+    """Raised when an LLM reply does not contain the structured output its stage expects."""
+
+
+class ArticleProfile(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    id: str = Field(..., min_length=1)
+    title: str = ""
+    tone: Optional[str] = None
+    perspective: List[str] = []
+    source_type: Optional[str] = None
+    region: Optional[str] = None
+
+    @field_validator("id", mode="before")
+    @classmethod
+    def _id_as_string(cls, value):
+        return str(value).strip() if isinstance(value, (str, int)) else value
+
+    @field_validator("perspective", mode="before")
+    @classmethod
+    def _perspective_as_list(cls, value):
+        if value is None:
+            return []
+        return [value] if isinstance(value, str) else value
+
+
+def extract_json(text):
+    """
+    Parse the JSON value in an LLM reply, tolerating markdown code fences and chatter around it.
+
+    Tries the whole reply, then each fenced block, then the first `[`/`{` from which a
+    complete JSON value can be decoded.
+    """
+    text = (text or "").strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    decoder = json.JSONDecoder()
+    for candidate in [block.strip() for block in _FENCE_RE.findall(text)] + [text]:
+        for start, char in enumerate(candidate):
+            if char not in "[{":
+                continue
+            try:
+                return decoder.raw_decode(candidate, start)[0]
+            except ValueError:
+                continue
+    raise OutputParseError("the reply contains no valid JSON")
+
+
+def _as_list(data, what):
+    # Models sometimes wrap the array in an object, e.g. {"profiles": [...]}.
+    if isinstance(data, dict):
+        lists = [value for value in data.values() if isinstance(value, list)]
+        if len(lists) == 1:
+            return lists[0]
+    if not isinstance(data, list):
+        raise OutputParseError(f"expected a JSON array of {what}, got {type(data).__name__}")
+    return data
+
+
+def parse_profiles(text):
+    """Validated profiler output as a list of dicts; invalid entries are dropped unless none is valid."""
+    profiles, errors = [], []
+    for item in _as_list(extract_json(text), "article profiles"):
+        try:
+            profiles.append(ArticleProfile.model_validate(item).model_dump(exclude_unset=True))
+        except ValidationError as e:
+            errors.append(e.errors()[0]["msg"] if e.errors() else str(e))
+    if errors:
+        metrics.incr("structured.profiling.invalid_items", len(errors))
+        if not profiles:
+            raise OutputParseError(f"no valid article profile in the reply ({errors[0]})")
+        logger.warning(f"⚠️ Dropped {len(errors)} invalid article profiles: {errors[0]}")
+    if not profiles:
+        raise OutputParseError("the reply lists no article profiles")
+    return profiles
+
+
+def parse_selected_ids(text):
+    """Selector output as a list of article IDs; `{"id": ...}` objects are accepted too."""
+    ids = []
+    for item in _as_list(extract_json(text), "article IDs"):
+        if isinstance(item, dict):
+            item = item.get("id")
+        if isinstance(item, (str, int)) and str(item).strip():
+            ids.append(str(item))
+    if not ids:
+        raise OutputParseError("the reply lists no article IDs")
+    return ids
+
+
+async def run_structured(agent, messages, step, parse):
+    """
+    Run `agent` and return `parse(reply)`.
+
+    If the reply cannot be parsed, the model is shown its reply and the parse error and asked
+    for corrected JSON, up to STRUCTURED_REPAIR_RETRIES times, before OutputParseError is raised.
+    Only this step is repeated, so one formatting slip does not cost the rest of the job.
+    """
+    conversation = list(messages)
+    content = await run_agent(agent, conversation, step)
+    for attempt in range(1 + STRUCTURED_REPAIR_RETRIES):
+        metrics.incr(f"structured.{step}.attempts")
+        try:
+            result = parse(content)
+        except OutputParseError as e:
+            metrics.incr(f"structured.{step}.parse_failures")
+            if attempt == STRUCTURED_REPAIR_RETRIES:
+                metrics.incr(f"structured.{step}.gave_up")
+                raise
+            logger.warning(f"⚠️ Unparsable {step} output ({e}), asking the model to repair it")
+            conversation += [
+                {"role": "assistant", "content": content},
+                {"role": "user", "content": REPAIR_PROMPT.format(error=str(e)[:500])},
+            ]
+            content = await run_agent(agent, conversation, step)
+            continue
+        if attempt:
+            metrics.incr(f"structured.{step}.repaired")
+        return result
+
+
+def parse_stats():
+    """Per-step structured-output parse attempts, failures and failure rate."""
+    counters = metrics.snapshot()["counters"]
+    steps = {name.split(".")[1] for name in counters if name.startswith("structured.")}
+    stats = {}
+    for step in sorted(steps):
+        attempts = counters.get(f"structured.{step}.attempts", 0)
+        failures = counters.get(f"structured.{step}.parse_failures", 0)
+        stats[step] = {
+            "attempts": attempts,
+            "parse_failures": failures,
+            "failure_rate": round(failures / attempts, 4) if attempts else None,
+            "repaired": counters.get(f"structured.{step}.repaired", 0),
+            "gave_up": counters.get(f"structured.{step}.gave_up", 0),
+            "invalid_items": counters.get(f"structured.{step}.invalid_items", 0),
+        }
+    return stats
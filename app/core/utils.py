@@ -1,13 +1,26 @@
 import re
 import uuid
 import json
+import math
+import time
+import asyncio
 from datetime import datetime
-import trafilatura
 from serpapi import GoogleSearch
-from app.config import SERPAPI_KEY, NUM_SOURCES
+from app.config import (
+    SERPAPI_KEY,
+    NUM_SOURCES,
+    SEARCH_EARLY_CUTOFF,
+    SEARCH_OVERFETCH_FACTOR,
+    SEARCH_DEADLINE_SECONDS,
+    MIN_ARTICLE_CHARS,
+    DEDUP_ENABLED,
+)
 from app.core.logger import logger
+from app.core.cache import get_article_cache, get_search_cache, normalize_query
+from app.core.fetcher import get_fetcher, FetchError
+from app.core.domain_health import domain_health, domain_of
+from app.core.dedup import NearDuplicateFilter
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 def clean_text(text):
     if not isinstance(text, str):
@@ -28,83 +41,164 @@ def is_json_serializable(article):
         logger.error(f"❌ Error: {e}")
         return False    
 
-def fetch_full_article(url):
+async def fetch_full_article(url):
+    """Return the extracted text of `url`, or None if it could not be downloaded or extracted."""
+    cache = get_article_cache()
+    cached = await cache.lookup(url)
+    if cached is not None:
+        ok, text = cached
+        logger.debug(f"📦 Article cache {'hit' if ok else 'negative hit'} for {url}")
+        return text if ok else None
+
+    domain = domain_of(url)
+    if not domain_health.allow(domain):
+        logger.debug(f"⛔ Skipping {url}: circuit open for {domain}")
+        return None
+
     logger.debug(f"Attempting to fetch article from URL: {url}")
+    fetcher = get_fetcher()
+    start_time = time.monotonic()
+    downloaded = None
     try:
-        downloaded = trafilatura.fetch_url(url)
+        downloaded = await fetcher.download(url, timeout=domain_health.timeout_for(domain))
         if downloaded:
-            extracted_text = trafilatura.extract(downloaded, include_comments=False, include_tables=False)
+            extracted_text = await fetcher.extract(downloaded, url)
             if extracted_text:
                 logger.debug(f"Parsed article from {url}, length={len(extracted_text)} chars")
+                domain_health.record_success(domain, time.monotonic() - start_time)
+                await cache.store_content(url, extracted_text)
                 return extracted_text
             else:
                 logger.warning(f"Trafilatura extracted no content from {url}")
-                return "Failed to extract article content: No content found"
+                reason = "Failed to extract article content: No content found"
         else:
-            logger.warning(f"Trafilatura failed to download content from {url}")
-            return "Failed to fetch article content: Download failed"
+            logger.warning(f"Empty response body from {url}")
+            reason = "Failed to fetch article content: Download failed"
+    except asyncio.CancelledError:
+        domain_health.abandon(domain)
+        raise
+    except FetchError as e:
+        logger.warning(f"Failed to download content from {url}: {e}")
+        reason = f"Failed to fetch article content: {e}"
     except Exception as e:
         logger.error(f"Error fetching full article from {url}: {e}")
-        return f"Failed to fetch article content: {type(e).__name__}"
+        reason = f"Failed to fetch article content: {type(e).__name__}"
+    domain_health.record_failure(domain, time.monotonic() - start_time, reason, downloaded=bool(downloaded))
+    await cache.store_failure(url, reason)
+    return None
 
-def search_news(topic):
-    """
-    Fetches and compiles recent news articles on a given topic.
+class SearchError(Exception):
+    """Raised when the news search provider cannot be queried."""
 
-    This function is designed to be called **once** by the search agent within the multi-agent pipeline.
-    It uses SerpAPI to retrieve headlines and the Newspaper library to extract full article content.
-    Returns a structured and cleaned JSON string of articles for downstream analysis.
-    """
-    logger.debug("Calling SerpAPI...")
+
+async def search_results(topic):
+    """SerpAPI news results for `topic`, served through the search cache. Raises SearchError."""
+    query = normalize_query(topic)
+    month = datetime.now().strftime('%Y-%m')
+    num_candidates = math.ceil(NUM_SOURCES * SEARCH_OVERFETCH_FACTOR) if SEARCH_EARLY_CUTOFF else NUM_SOURCES
     params = {
         "engine": "google",
-        "q": f"{topic} news {datetime.now().strftime('%Y-%m')}",
+        "q": f"{query} news {month}",
         "tbm": "nws",  
-        "num": NUM_SOURCES,
+        "num": num_candidates,
         "api_key": SERPAPI_KEY  
 
     }
-    logger.debug(f"Search parameters: {params}")
 
-    try:
+    def fetch_results():
+        logger.debug("Calling SerpAPI...")
+        logger.debug(f"Search parameters: {params}")
         search = GoogleSearch(params)
         results = search.get_dict()
-        news_results = results.get("news_results", [])
+        return results.get("news_results", [])
+
+    try:
+        news_results = await asyncio.to_thread(
+            get_search_cache().get_or_fetch, f"{query}|{month}|{num_candidates}", fetch_results
+        )
         logger.info(f"🔍 Found {len(news_results)} results from SerpAPI")
         for i, item in enumerate(news_results):
             logger.debug(f"{i+1}. {item.get('title', 'No title')}")
 
 
     except Exception as e:
-        return f"[Error fetching search results: {e}]"
+        raise SearchError(f"Error fetching search results: {e}") from e
+    return news_results
+
+
+async def search_news(topic, news_results=None):
+    """
+    Fetches recent news articles on a given topic, yielding each one as soon as it is cleaned.
 
+    This async generator is designed to be consumed **once** per job within the multi-agent pipeline.
+    It uses SerpAPI to retrieve headlines (unless `news_results` were already fetched with
+    `search_results`) and the shared async fetcher to download and extract full article content.
+    Yields article dicts in completion order; near-duplicates of an article already yielded are
+    recorded in its `alternate_sources` instead. Raises SearchError if SerpAPI cannot be queried.
+    Closing the generator early cancels the downloads still in flight.
+    """
+    if news_results is None:
+        news_results = await search_results(topic)
     if not news_results:
-        return f"No news found for {topic}."
-
-    compiled = []
-    with ThreadPoolExecutor(max_workers=NUM_SOURCES) as executor:
-        future_to_item = {executor.submit(fetch_full_article, item.get("link", "")): item for item in news_results}
-        
-        for future in as_completed(future_to_item):
-            item = future_to_item[future]
-            try:
-                full_text = future.result()
+        return
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + SEARCH_DEADLINE_SECONDS if SEARCH_EARLY_CUTOFF else None
+    unique_results = {}
+    for item in news_results:
+        unique_results.setdefault(item.get("link", "").strip(), item)
+    # SerpAPI rank of each result; fetch priority below shifts with domain health, this does not.
+    rank = {id(item): i for i, item in enumerate(unique_results.values())}
+    # Known-good publishers first, so they are first in line for connection slots.
+    news_results = sorted(unique_results.values(), key=lambda item: domain_health.priority(domain_of(item.get("link", ""))))
+    tasks = {asyncio.create_task(fetch_full_article(item.get("link", ""))): item for item in news_results}
+    pending = set(tasks)
+    duplicates = NearDuplicateFilter() if DEDUP_ENABLED else None
+    yielded = 0
+    try:
+        while pending and yielded < NUM_SOURCES:
+            timeout = None if deadline is None else deadline - loop.time()
+            if timeout is not None and timeout <= 0:
+                logger.info(f"⏱️ Search deadline reached with {yielded} usable articles, dropping {len(pending)} stragglers")
+                break
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            # In SerpAPI order rather than set order, so a run served from the article cache
+            # (where everything completes at once) keeps the same articles every time.
+            for task in sorted(done, key=lambda task: rank[id(tasks[task])]):
+                if yielded >= NUM_SOURCES:
+                    break
+                item = tasks[task]
+                try:
+                    full_text = task.result()
+                except Exception as exc:
+                    logger.error(f"🚨 Article at {item.get('link')} generated an exception: {exc}")
+                    continue
                 cleaned = clean_text(full_text)
+                if len(cleaned) < MIN_ARTICLE_CHARS:
+                    logger.debug(f"🗑️ Skipping unusable article ({len(cleaned)} chars): {item.get('link')}")
+                    continue
                 logger.debug(f"🧼 Cleaned article:\n{cleaned[:300]}...")
 
+                # Stable per URL, so the same article set hashes the same across jobs (see StageCache).
                 article = {
-                    "id": str(uuid.uuid4()),  
+                    "id": str(uuid.uuid5(uuid.NAMESPACE_URL, item.get("link", "").strip())),
                     "title": item.get("title", "").strip(),
                     "source": item.get("source", "").strip(),
                     "date": item.get("date", "").strip(),
                     "url": item.get("link", "").strip(),
                     "content": cleaned
                 }
+                if duplicates is not None and not duplicates.add(article):
+                    continue
                 if is_json_serializable(article):
-                    compiled.append(article)
+                    yielded += 1
+                    yield article
                 else:
                     logger.warning(f"⚠️ Skipping article due to serialization issue: {article['url']}")
-            except Exception as exc:
-                logger.error(f"🚨 Article at {item.get('link')} generated an exception: {exc}")
+    finally:
+        for task in pending:
+            task.cancel()
 
-    return json.dumps(compiled, indent=2, ensure_ascii=False)
\ No newline at end of file
+    if duplicates is not None and duplicates.duplicates:
+        logger.info(f"🪞 Folded {duplicates.duplicates} near-duplicate articles into their representatives")
+    logger.debug(f"📦 Article cache stats: {get_article_cache().stats()}")
\ No newline at end of file
@@ -1,15 +1,34 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uuid
+import secrets
+import time
 import asyncio
 from datetime import datetime
 from app.core.process import process_news_backend
+from app.agents.agent_factory import warm_agents
+from app.core.fetcher import close_fetcher
+from app.core.llm import close_llm_client
+from app.core.routing import router
+from app.core.structured import parse_stats
+from app.core.domain_health import domain_health
+from app.core.metrics import metrics
+from app.core.coalesce import coalescer, job_key
+from app.core.job_store import get_job_store, RUNNING, COMPLETED, FAILED, CANCELLED
+from app.core.scheduler import scheduler, SchedulerFull
+from app.core.events import get_event_bus, close_event_bus
+from app.core.registry import registry, RegistryFull
+from app.config import (
+    COALESCE_JOBS, JOB_RESUME_MAX_AGE, SCHEDULER_DISCONNECT_GRACE, TRUSTED_PROXY_HOPS, DEBUG_API_TOKEN,
+    JOB_REGISTRY_SWEEP_SECONDS, WS_HEARTBEAT_INTERVAL, WS_HEARTBEAT_TIMEOUT,
+)
 from app.core.logger import logger
 import uvicorn
 import json
 from typing import List, Dict, Any
 import os
+from contextlib import asynccontextmanager
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
@@ -22,7 +41,33 @@ supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 supabase: Client = create_client(supabase_url, supabase_key)
 # --------------------
 
-app = FastAPI()
+async def sweep_jobs():
+    """Periodically drop finished jobs from the registry and the coalescer."""
+    while True:
+        await asyncio.sleep(JOB_REGISTRY_SWEEP_SECONDS)
+        registry.evict_expired()
+        coalescer.evict_expired()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Render every prompt and build every agent once, before the first job needs them.
+    logger.info(f"🧩 Prepared {warm_agents()} agents")
+    # Jobs still marked running were cut off by a restart; pick them up from their last checkpoint.
+    for job in get_job_store().interrupted(JOB_RESUME_MAX_AGE):
+        logger.info(f"♻️ Resuming interrupted job {job['job_id']} ({job['topic']})")
+        try:
+            await start_job(job["job_id"], job["topic"], job["user_preferences"], None)
+        except (SchedulerFull, RegistryFull):
+            logger.warning(f"⚠️ No room to resume job {job['job_id']}, marking it failed")
+            get_job_store().set_status(job["job_id"], FAILED)
+    sweeper = asyncio.create_task(sweep_jobs())
+    yield
+    sweeper.cancel()
+    await close_fetcher()
+    await close_llm_client()
+    await close_event_bus()
+
+app = FastAPI(lifespan=lifespan)
 
 origins_str = os.environ.get("CORS_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173")
 origins = [origin.strip().rstrip('/') for origin in origins_str.split(",")]
@@ -40,33 +85,295 @@ class NewsRequest(BaseModel):
     topic: str
     user_preferences: dict
 
-connections = {}
+LISTENER_CHECK_SECONDS = 5
+
+def client_address(request: Request):
+    """
+    The caller's address as seen by our outermost trusted proxy. Earlier X-Forwarded-For
+    entries come from the client and are ignored, since anyone can send them.
+    """
+    hops = [hop.strip() for hop in request.headers.get("X-Forwarded-For", "").split(",") if hop.strip()]
+    if TRUSTED_PROXY_HOPS and len(hops) >= TRUSTED_PROXY_HOPS:
+        return hops[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
+
+async def client_id(request: Request):
+    """Identity for per-user limits: the Supabase user of a valid bearer token, else the client address."""
+    auth_header = request.headers.get('Authorization')
+    if auth_header and auth_header.startswith('Bearer '):
+        try:
+            user = (await asyncio.to_thread(supabase.auth.get_user, auth_header.split(' ')[1])).user
+            if user:
+                return f"user:{user.id}"
+        except Exception as e:
+            logger.debug(f"Bearer token not usable for per-user limits, falling back to the address: {e}")
+    return f"ip:{client_address(request)}"
+
+async def cancel_when_abandoned(run):
+    """
+    Cancel the run once it has had listeners on the event bus, from any worker, and none
+    has been back for SCHEDULER_DISCONNECT_GRACE seconds.
+    """
+    event_bus = get_event_bus()
+    seen_listener = False
+    empty_since = None
+    while True:
+        await asyncio.sleep(LISTENER_CHECK_SECONDS)
+        try:
+            listeners = await event_bus.listener_count(run.primary_job_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not count listeners for job {run.primary_job_id}: {e}")
+            continue
+        if listeners:
+            seen_listener, empty_since = True, None
+        elif seen_listener:
+            empty_since = empty_since or time.time()
+            if time.time() - empty_since >= SCHEDULER_DISCONNECT_GRACE:
+                store = get_job_store()
+                for job_id in list(run.job_ids):
+                    store.set_status(job_id, CANCELLED)
+                    registry.set_state(job_id, CANCELLED)
+                scheduler.cancel(run.primary_job_id)
+                return
+
+async def run_shared_job(run, topic, user_preferences, entry):
+    succeeded = False
+    sender = get_run_sender(run)
+
+    async def report_position(position):
+        await sender({"step": "queue", "status": "queued", "position": position,
+                      "message": f"⏳ Waiting for a free slot ({position - 1} ahead of you)"
+                      if position > 1 else "⏳ You're next in line"})
+
+    watchdog = asyncio.create_task(cancel_when_abandoned(run))
+    try:
+        async with scheduler.slot(entry, report_position):
+            for job_id in list(run.job_ids):
+                registry.set_state(job_id, RUNNING)
+            succeeded = await process_news_backend(run.primary_job_id, topic, user_preferences, sender, supabase)
+    except asyncio.CancelledError:
+        # Shutdown leaves the job marked running so it resumes on the next start; a client
+        # that went away has already had it marked cancelled.
+        coalescer.finish(run, False)
+        raise
+    except Exception as e:
+        # Anything process_news_backend did not handle itself (e.g. the job store failing):
+        # the run must still finish, or identical requests would attach to it forever.
+        logger.exception(f"Pipeline crashed for job_id {run.primary_job_id}")
+        try:
+            await sender({"step": "error", "message": f"Processing failed: {e}"})
+        except Exception:
+            pass
+    finally:
+        watchdog.cancel()
+        try:
+            await get_event_bus().finish(run.primary_job_id)
+        except Exception as e:
+            logger.error(f"Error finishing event log for job_id {run.primary_job_id}: {e}")
+    try:
+        store = get_job_store()
+        for job_id in list(run.job_ids):
+            registry.set_state(job_id, COMPLETED if succeeded else FAILED)
+            store.set_status(job_id, COMPLETED if succeeded else FAILED)
+    except Exception as e:
+        logger.error(f"Error recording the status of job_id {run.primary_job_id}: {e}")
+    finally:
+        coalescer.finish(run, bool(succeeded))
+
+async def start_job(job_id, topic, user_preferences, user):
+    """
+    Attach `job_id` to a matching run, launching the pipeline if there is none.
+
+    Raises SchedulerFull if a new run would not fit in the scheduler's queue, or
+    RegistryFull if this worker already tracks too many jobs.
+    """
+    registry.register(job_id, user)
+    key = job_key(topic, user_preferences) if COALESCE_JOBS else job_id
+    run, started = coalescer.attach(job_id, key)
+    if started:
+        try:
+            entry = scheduler.submit(job_id, user)
+        except SchedulerFull:
+            coalescer.forget(job_id)
+            registry.discard(job_id)
+            raise
+        asyncio.create_task(run_shared_job(run, topic, user_preferences, entry))
+    else:
+        primary = registry.get(run.primary_job_id)
+        registry.set_state(job_id, COMPLETED if run.done else primary.state if primary else RUNNING)
+    # Any worker serving this job's WebSocket must find the run's channel.
+    await get_event_bus().alias(job_id, run.primary_job_id)
+    store = get_job_store()
+    store.create(job_id, topic, user_preferences)
+    store.set_status(job_id, COMPLETED if run.done else RUNNING)
+    return run
+
+def rejected(exc):
+    if isinstance(exc, RegistryFull):
+        logger.error(f"🚦 Rejected job, registry is full: {exc}")
+        return HTTPException(status_code=503, detail="Server is busy", headers={"Retry-After": str(JOB_REGISTRY_SWEEP_SECONDS)})
+    logger.warning(f"🚦 Rejected job: {exc} (retry after {exc.retry_after}s)")
+    return HTTPException(status_code=exc.status_code, detail=str(exc), headers={"Retry-After": str(exc.retry_after)})
 
 @app.post("/process_news")
-async def process_news(request: NewsRequest):
+async def process_news(request: NewsRequest, http_request: Request):
     logger.info(f"Received request for topic: {request.topic}")
     job_id = str(uuid.uuid4())
-    connections[job_id] = None
+    try:
+        await start_job(job_id, request.topic, request.user_preferences, await client_id(http_request))
+    except (SchedulerFull, RegistryFull) as e:
+        raise rejected(e)
     logger.info(f"Created job_id: {job_id}")
-    asyncio.create_task(process_news_backend(job_id, request.topic, request.user_preferences, get_websocket_sender(job_id), supabase))
     return {"message": "Process started", "job_id": job_id}
 
+@app.post("/process_news/{job_id}/retry")
+async def retry_job(job_id: str, request: Request):
+    job = get_job_store().load(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    run = coalescer.run_for(job_id)
+    running_elsewhere = job["status"] == RUNNING and time.time() - job["updated_at"] < JOB_RESUME_MAX_AGE
+    if (run is not None and not run.done) or (run is None and running_elsewhere):
+        raise HTTPException(status_code=409, detail="Job is still running")
+    if run is not None:
+        # Detach from the finished run so the retry gets a fresh one.
+        coalescer.forget(job_id)
+    logger.info(f"🔁 Retrying job {job_id} from stages: {', '.join(job['stages']) or 'start'}")
+    try:
+        await start_job(job_id, job["topic"], job["user_preferences"], await client_id(request))
+    except (SchedulerFull, RegistryFull) as e:
+        raise rejected(e)
+    return {"message": "Process restarted", "job_id": job_id, "completed_stages": list(job["stages"])}
+
 @app.websocket("/ws/status/{job_id}")
-async def websocket_endpoint(websocket: WebSocket, job_id: str):
+async def websocket_endpoint(websocket: WebSocket, job_id: str, last_seq: int = 0):
+    """
+    Stream a job's events, each tagged with its `seq`. A reconnecting client passes the last
+    seq it saw as `?last_seq=` and receives only what came after, then live events. A
+    `last_seq` past the channel's latest event means the numbering restarted; the client gets
+    a `{"step": "replay", "status": "reset"}` notice and the whole log again.
+
+    Every WS_HEARTBEAT_INTERVAL seconds the server sends `{"step": "heartbeat"}`; a failed
+    send drops the connection. Clients that answer with "pong" (or send anything) are also
+    dropped once they stay silent for WS_HEARTBEAT_TIMEOUT seconds.
+    """
     await websocket.accept()
-    connections[job_id] = websocket
-    logger.info(f"WebSocket connection established for job_id: {job_id}")
-    try:
+    event_bus = get_event_bus()
+    channel = await event_bus.resolve(job_id)
+    send_lock = asyncio.Lock()
+    last_message = None
+
+    async def send(data):
+        async with send_lock:
+            await websocket.send_json(data)
+
+    async def forward(live):
+        # Subscribed before reading history, so nothing falls in between; seq drops the overlap.
+        sent_seq = last_seq
+        backlog = await event_bus.history(channel)
+        current_seq = backlog[-1][0] if backlog else 0
+        if last_seq > current_seq:
+            # The client saw more events than the channel has: its numbering restarted (e.g. the
+            # job was resumed after a restart wiped the in-memory log), so replay from the start.
+            logger.info(f"🔁 last_seq {last_seq} is ahead of job_id {job_id} (at {current_seq}), replaying from the start")
+            await send({"step": "replay", "status": "reset", "last_seq": current_seq,
+                        "message": "The job's updates restarted; replaying them from the beginning."})
+            sent_seq = 0
+        backlog = [(seq, event) for seq, event in backlog if seq > sent_seq]
+        if backlog and backlog[0][0] > sent_seq + 1:
+            await send({"step": "replay", "status": "truncated", "first_seq": backlog[0][0],
+                        "message": "Some earlier updates are no longer available."})
+        for seq, event in backlog:
+            await send({**event, "seq": seq})
+            sent_seq = seq
+        async for seq, event in live:
+            if seq > sent_seq:
+                await send({**event, "seq": seq})
+                sent_seq = seq
+
+    async def receive():
+        nonlocal last_message
+        try:
+            while True:
+                await websocket.receive_text()
+                last_message = time.time()
+                registry.seen(job_id)
+        except WebSocketDisconnect:
+            pass
+
+    async def heartbeat():
         while True:
-            await websocket.receive_text()
-    except WebSocketDisconnect:
+            await asyncio.sleep(WS_HEARTBEAT_INTERVAL)
+            if last_message is not None and time.time() - last_message > WS_HEARTBEAT_TIMEOUT:
+                logger.info(f"💔 No pong from job_id {job_id} for {WS_HEARTBEAT_TIMEOUT:.0f}s, dropping the connection")
+                return
+            try:
+                await asyncio.wait_for(send({"step": "heartbeat", "ts": time.time()}), WS_HEARTBEAT_INTERVAL)
+            except Exception as e:
+                logger.info(f"💔 Heartbeat to job_id {job_id} failed, dropping the connection: {e!r}")
+                return
+
+    logger.info(f"WebSocket connection established for job_id: {job_id} (last_seq={last_seq})")
+    registry.connected(job_id)
+    client_gone = False
+    try:
+        async with event_bus.subscribe(channel) as live:
+            receiver = asyncio.create_task(receive())
+            tasks = [receiver, asyncio.create_task(forward(live)), asyncio.create_task(heartbeat())]
+            try:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                client_gone = receiver in done
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        registry.disconnected(job_id)
+        metrics.incr("websocket.closed")
         logger.info(f"WebSocket connection closed for job_id: {job_id}")
-        del connections[job_id]
+    if not client_gone:
+        # We are the ones dropping it (dead or silent client): close the socket for real.
+        try:
+            await websocket.close()
+        except Exception:
+            pass
 
 @app.get("/")
 async def read_root():
     return {"message": "Backend is running"}
 
+def require_debug_token(request: Request):
+    """Gate for /api/debug/*: they expose internal load and per-publisher data, so they need DEBUG_API_TOKEN."""
+    if not DEBUG_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    auth_header = request.headers.get('Authorization') or ''
+    if not auth_header.startswith('Bearer ') or not secrets.compare_digest(auth_header[len('Bearer '):], DEBUG_API_TOKEN):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+@app.get("/api/debug/domains", dependencies=[Depends(require_debug_token)])
+async def get_domain_health():
+    return {"domains": domain_health.snapshot()}
+
+@app.get("/api/debug/metrics", dependencies=[Depends(require_debug_token)])
+async def get_metrics():
+    return metrics.snapshot()
+
+@app.get("/api/debug/scheduler", dependencies=[Depends(require_debug_token)])
+async def get_scheduler():
+    return scheduler.stats()
+
+@app.get("/api/debug/jobs", dependencies=[Depends(require_debug_token)])
+async def get_jobs():
+    return registry.stats()
+
+@app.get("/api/debug/models", dependencies=[Depends(require_debug_token)])
+async def get_models():
+    return router.stats()
+
+@app.get("/api/debug/structured", dependencies=[Depends(require_debug_token)])
+async def get_structured_outputs():
+    return parse_stats()
+
 @app.post("/api/history")
 async def save_search_history(request: Request):
     try:
@@ -216,11 +523,13 @@ async def delete_search_history(job_id: str, request: Request):
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {str(e)}")
 
 
-def get_websocket_sender(job_id: str):
+def get_run_sender(run):
+    """Publish each event of the shared run on the event bus, where every attached job's WebSocket picks it up."""
+    event_bus = get_event_bus()
+
     async def sender(data: dict):
-        if job_id in connections and connections[job_id]:
-            try:
-                await connections[job_id].send_json(data)
-            except Exception as e:
-                logger.error(f"Error sending websocket message for job_id {job_id}: {e}")
+        try:
+            await event_bus.publish(run.primary_job_id, data)
+        except Exception as e:
+            logger.error(f"Error publishing event for job_id {run.primary_job_id}: {e}")
     return sender
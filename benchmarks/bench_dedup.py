@@ -0,0 +1,62 @@
+"""
+Cost of near-duplicate detection on a typical search result set.
+
+Builds N synthetic articles of ~800 words, a third of which are lightly edited wire
+copies of another article, then times NearDuplicateFilter over the whole set.
+
+    python -m benchmarks.bench_dedup [repeats]
+"""
+import sys
+import time
+import random
+import statistics
+
+from app.core.dedup import NearDuplicateFilter
+
+VOCABULARY = (
+    "government officials announced new policy measures markets reacted sharply while analysts warned "
+    "that inflation could rise further workers unions protested outside parliament as ministers defended "
+    "the budget plan citing growth forecasts and rising energy costs across the region"
+).split()
+
+
+def make_article(rng, words=800):
+    return " ".join(rng.choice(VOCABULARY) + str(rng.randint(0, 50)) for _ in range(words))
+
+
+def make_wire_copy(rng, text):
+    words = text.split()
+    for _ in range(len(words) // 40):  # ~2.5% of words edited by the outlet
+        words[rng.randrange(len(words))] = "edited"
+    return "Reporting by staff. " + " ".join(words) + " Additional reporting by local desk."
+
+
+def make_corpus(n, rng):
+    originals = [make_article(rng) for _ in range(n - n // 3)]
+    copies = [make_wire_copy(rng, original) for original in rng.sample(originals, n // 3)]
+    bodies = originals + copies
+    rng.shuffle(bodies)
+    return [{"id": str(i), "url": f"http://example.com/{i}", "content": body} for i, body in enumerate(bodies)]
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rng = random.Random(7)
+    for n in (15, 30, 50):
+        corpus = make_corpus(n, rng)
+        timings, folded = [], 0
+        for _ in range(repeats):
+            articles = [dict(a) for a in corpus]
+            start = time.perf_counter()
+            dedup = NearDuplicateFilter()
+            kept = [a for a in articles if dedup.add(a)]
+            timings.append((time.perf_counter() - start) * 1000)
+            folded = dedup.duplicates
+        print(
+            f"{n:>3} articles: median {statistics.median(timings):.1f}ms, max {max(timings):.1f}ms "
+            f"| kept {len(kept)}, folded {folded} (expected {n // 3})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Event-loop latency while extracting articles, with and without the extraction process pool.
+
+A probe coroutine stands in for the API/WebSocket handlers: it wakes every 5 ms and
+records how late it was. Meanwhile a batch of synthetic news pages is extracted through
+ArticleFetcher.extract, first in thread mode and then in process mode.
+
+    python -m benchmarks.bench_extraction [num_docs] [paragraphs_per_doc]
+"""
+import sys
+import time
+import asyncio
+import statistics
+
+from app.core.fetcher import ArticleFetcher
+
+PROBE_INTERVAL = 0.005
+
+
+def make_page(i, paragraphs):
+    body = "".join(
+        f"<p>Paragraph {p} of story {i}: officials said the measure would affect thousands of residents, "
+        f"while critics argued the figures were misleading and the timeline unrealistic.</p>"
+        for p in range(paragraphs)
+    )
+    nav = "".join(f"<li><a href='/section/{n}'>Section {n}</a></li>" for n in range(200))
+    return (
+        f"<html><head><title>Story {i}</title></head><body><nav><ul>{nav}</ul></nav>"
+        f"<article><h1>Story {i}</h1>{body}</article><footer>Footer</footer></body></html>"
+    ).encode()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def probe(lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append((time.perf_counter() - start - PROBE_INTERVAL) * 1000)
+
+
+async def run(mode, pages):
+    fetcher = ArticleFetcher(executor=mode)
+    if mode == "process":
+        # Warm the pool so worker start-up is not counted.
+        await asyncio.gather(*(fetcher.extract(page, "http://warmup") for page in pages[: fetcher._pool.workers]))
+    lags, stop = [], asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(fetcher.extract(page, f"http://example.com/{i}") for i, page in enumerate(pages)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+    await fetcher.close()
+    print(
+        f"{mode:>8}: {len(pages)} docs in {elapsed:.2f}s | loop lag p50={statistics.median(lags):.1f}ms "
+        f"p99={percentile(lags, 99):.1f}ms max={max(lags):.1f}ms"
+    )
+
+
+def main():
+    num_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    paragraphs = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    pages = [make_page(i, paragraphs) for i in range(num_docs)]
+    print(f"{num_docs} pages, ~{len(pages[0]) // 1024} KiB each")
+    for mode in ("thread", "process"):
+        asyncio.run(run(mode, pages))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+from app.core.coalesce import JobCoalescer, job_key, MIN_RETENTION_SECONDS
+
+
+def test_key_ignores_topic_case_and_spacing():
+    prefs = {"focus": "The Clash", "depth": 1, "tone": "Gen Z Mode"}
+    assert job_key("  AI   Regulation ", prefs) == job_key("ai regulation", prefs)
+    assert job_key("ai regulation", prefs) != job_key("ai regulation", {**prefs, "depth": 2})
+
+
+def test_identical_jobs_attach_to_the_running_run():
+    coalescer = JobCoalescer(result_ttl=60)
+    run, started = coalescer.attach("a", "key")
+    joined, joined_started = coalescer.attach("b", "key")
+    assert started and not joined_started
+    assert joined is run
+    assert run.job_ids == {"a", "b"}
+    assert coalescer.run_for("b") is run
+
+
+def test_successful_run_is_reused_until_it_expires():
+    coalescer = JobCoalescer(result_ttl=60)
+    run, _ = coalescer.attach("a", "key")
+    coalescer.finish(run, True)
+    assert coalescer.attach("b", "key") == (run, False)
+
+    run.finished_at -= 61
+    fresh, started = coalescer.attach("c", "key")
+    assert started and fresh is not run
+
+
+def test_failed_run_is_not_reused():
+    coalescer = JobCoalescer(result_ttl=60)
+    run, _ = coalescer.attach("a", "key")
+    coalescer.finish(run, False)
+    fresh, started = coalescer.attach("b", "key")
+    assert started and fresh is not run
+    # The failed job can still be looked up, e.g. for a WebSocket replay.
+    assert coalescer.run_for("a") is run
+
+
+def test_finished_jobs_are_evicted_after_the_retention_period():
+    coalescer = JobCoalescer(result_ttl=0)
+    run, _ = coalescer.attach("a", "key")
+    coalescer.finish(run, True)
+    coalescer.evict_expired()
+    assert coalescer.run_for("a") is run
+    run.finished_at -= MIN_RETENTION_SECONDS + 1
+    coalescer.evict_expired()
+    assert coalescer.run_for("a") is None
+    assert len(coalescer) == 0
+
+
+def test_forget_detaches_a_job_for_retry():
+    coalescer = JobCoalescer(result_ttl=60)
+    run, _ = coalescer.attach("a", "key")
+    coalescer.finish(run, True)
+    coalescer.forget("a")
+    assert coalescer.run_for("a") is None
+    fresh, started = coalescer.attach("a", "key")
+    assert started and fresh is not run
@@ -0,0 +1,46 @@
+import pytest
+
+from app.core.compaction import compact_articles, estimate_tokens, trim_content
+
+
+def test_short_text_is_untouched():
+    text = "One sentence. Another one."
+    assert trim_content(text, "title", 100) is text
+
+
+def test_keeps_lead_sentences_and_relevant_ones_in_order():
+    lead = "Lead one. Lead two. Lead three."
+    filler = " ".join(f"Filler sentence number {chr(65 + i)} here." for i in range(20))
+    text = f"{lead} {filler} The Senate passed the budget bill 52-48 on Tuesday."
+    trimmed = trim_content(text, "Senate budget bill", 25)
+    assert trimmed.startswith(lead)
+    assert trimmed.endswith("The Senate passed the budget bill 52-48 on Tuesday.")
+    assert estimate_tokens(trimmed) <= 25
+
+
+@pytest.mark.parametrize("text", [
+    "x" * 40_000,                                      # no spaces, no sentence breaks
+    "word " * 8_000,                                   # no sentence breaks
+    "第一句很长。" * 5_000,                              # sentence breaks the splitter does not see
+    "this starts lowercase. and so does this. " * 1_000,
+    "A very long lead sentence " + "that goes on " * 3_000 + ". Then a short one.",
+])
+def test_budget_holds_without_usable_sentence_breaks(text):
+    assert estimate_tokens(trim_content(text, "title", 350)) <= 350
+
+
+def test_long_later_lead_sentence_is_cut_not_dropped():
+    text = "Short lead. " + "Second " * 400 + ". Third."
+    trimmed = trim_content(text, "title", 60)
+    assert trimmed.startswith("Short lead. Second")
+    assert trimmed.endswith("…")
+    assert estimate_tokens(trimmed) <= 60
+
+
+def test_compact_articles_only_trims_content():
+    article = {"id": "a", "title": "T", "url": "u", "content": "Word. " * 5_000}
+    compacted, before, after = compact_articles([article], "profiling", 2)
+    assert compacted[0]["id"] == "a" and compacted[0]["url"] == "u"
+    assert estimate_tokens(compacted[0]["content"]) <= 350
+    assert after < before
+    assert article["content"] == "Word. " * 5_000
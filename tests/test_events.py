@@ -0,0 +1,80 @@
+import asyncio
+
+from app.core.events import InMemoryEventBus
+
+
+def test_events_are_numbered_and_replayable():
+    async def main():
+        bus = InMemoryEventBus()
+        seqs = [await bus.publish("job", {"n": n}) for n in range(3)]
+        assert seqs == [1, 2, 3]
+        assert await bus.history("job") == [(1, {"n": 0}), (2, {"n": 1}), (3, {"n": 2})]
+        assert await bus.history("job", after_seq=2) == [(3, {"n": 2})]
+        assert await bus.history("other") == []
+
+    asyncio.run(main())
+
+
+def test_history_keeps_only_the_last_events():
+    async def main():
+        bus = InMemoryEventBus(max_events=2)
+        for n in range(5):
+            await bus.publish("job", {"n": n})
+        assert [seq for seq, _ in await bus.history("job")] == [4, 5]
+
+    asyncio.run(main())
+
+
+def test_subscribers_get_live_events():
+    async def main():
+        bus = InMemoryEventBus()
+        await bus.publish("job", {"n": 0})
+        async with bus.subscribe("job") as live:
+            assert await bus.listener_count("job") == 1
+            await bus.publish("job", {"n": 1})
+            assert await asyncio.wait_for(live.__anext__(), 1) == (2, {"n": 1})
+        assert await bus.listener_count("job") == 0
+
+    asyncio.run(main())
+
+
+def test_alias_points_a_job_at_another_channel():
+    async def main():
+        bus = InMemoryEventBus()
+        await bus.alias("joined", "primary")
+        assert await bus.resolve("joined") == "primary"
+        assert await bus.resolve("primary") == "primary"
+        await bus.alias("joined", "joined")
+        assert await bus.resolve("joined") == "joined"
+
+    asyncio.run(main())
+
+
+def test_finished_channels_expire_after_the_ttl():
+    async def main():
+        bus = InMemoryEventBus(ttl=60)
+        await bus.publish("old", {"n": 0})
+        await bus.finish("old")
+        await bus.publish("new", {"n": 0})
+        assert await bus.history("old") != []
+
+        bus._logs["old"].finished_at -= 61
+        await bus.publish("new", {"n": 1})
+        assert await bus.history("old") == []
+        # Publishing again starts a fresh log.
+        assert await bus.publish("old", {"n": 0}) == 1
+
+    asyncio.run(main())
+
+
+def test_channels_with_subscribers_are_kept():
+    async def main():
+        bus = InMemoryEventBus(ttl=60)
+        await bus.publish("job", {"n": 0})
+        await bus.finish("job")
+        bus._logs["job"].finished_at -= 61
+        async with bus.subscribe("job"):
+            await bus.publish("other", {"n": 0})
+            assert await bus.history("job") == [(1, {"n": 0})]
+
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+import pytest
+
+from app.core.job_store import RUNNING, COMPLETED
+from app.core.registry import JobRegistry, RegistryFull, QUEUED
+
+
+def test_register_and_track_state():
+    registry = JobRegistry(ttl=60, max_jobs=10)
+    record = registry.register("a", "alice")
+    assert record.state == QUEUED and not record.finished
+    registry.set_state("a", COMPLETED)
+    assert registry.get("a").finished
+    registry.register("a", None, RUNNING)
+    assert registry.get("a").owner == "alice"
+    assert registry.get("a").finished_at is None
+
+
+def test_finished_jobs_expire_unless_connected():
+    registry = JobRegistry(ttl=60, max_jobs=10)
+    for job_id in ("a", "b", "c"):
+        registry.register(job_id, None, COMPLETED)
+        registry.get(job_id).finished_at -= 61
+    registry.register("d", None, RUNNING)
+    registry.connected("b")
+    assert registry.evict_expired() == 2
+    assert registry.get("b") is not None and registry.get("d") is not None
+    registry.disconnected("b")
+    assert registry.evict_expired() == 1
+
+
+def test_cap_evicts_expired_then_oldest_finished():
+    registry = JobRegistry(ttl=60, max_jobs=3)
+    registry.register("old", None, COMPLETED)
+    registry.register("recent", None, COMPLETED)
+    registry.register("active", None, RUNNING)
+    registry.get("old").finished_at -= 30
+    registry.register("new", None)
+    assert registry.get("old") is None
+    assert all(registry.get(job_id) for job_id in ("recent", "active", "new"))
+    assert len(registry) == 3
+
+
+def test_cap_with_only_active_jobs_rejects():
+    registry = JobRegistry(ttl=60, max_jobs=2)
+    registry.register("a", None, RUNNING)
+    registry.register("b", None)
+    with pytest.raises(RegistryFull):
+        registry.register("c", None)
+    # Known jobs can still be updated at the cap.
+    registry.register("a", None, COMPLETED)
+
+
+def test_stats_count_states_and_connections():
+    registry = JobRegistry(ttl=60, max_jobs=10)
+    registry.register("a", None, RUNNING)
+    registry.register("b", None)
+    registry.connected("a")
+    stats = registry.stats()
+    assert stats["size"] == 2
+    assert stats["by_state"] == {RUNNING: 1, QUEUED: 1}
+    assert stats["connections"] == 1
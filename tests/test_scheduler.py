@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from app.core.scheduler import JobScheduler, SchedulerFull, MAX_RETRY_AFTER
+
+
+def test_starts_jobs_up_to_the_concurrency_limit():
+    scheduler = JobScheduler(max_concurrent=2, max_queue=5, per_user=2, per_user_queue=5)
+    entries = [scheduler.submit(f"job{i}", f"user{i}") for i in range(3)]
+    assert [e.started for e in entries] == [True, True, False]
+    assert scheduler.stats()["running"] == 2
+    assert scheduler.stats()["queued"] == 1
+
+
+def test_user_over_their_queue_share_gets_429():
+    scheduler = JobScheduler(max_concurrent=1, max_queue=10, per_user=1, per_user_queue=1)
+    scheduler.submit("a", "alice")
+    scheduler.submit("b", "alice")
+    with pytest.raises(SchedulerFull) as exc:
+        scheduler.submit("c", "alice")
+    assert exc.value.status_code == 429
+    assert exc.value.retry_after >= 1
+    # Other users are unaffected.
+    assert not scheduler.submit("d", "bob").started
+
+
+def test_full_global_queue_gets_503():
+    scheduler = JobScheduler(max_concurrent=1, max_queue=1, per_user=5, per_user_queue=5)
+    scheduler.submit("a", "alice")
+    scheduler.submit("b", "bob")
+    with pytest.raises(SchedulerFull) as exc:
+        scheduler.submit("c", "carol")
+    assert exc.value.status_code == 503
+    assert exc.value.retry_after >= 1
+
+
+def test_resumed_jobs_skip_per_user_limits():
+    scheduler = JobScheduler(max_concurrent=3, max_queue=10, per_user=1, per_user_queue=0)
+    entries = [scheduler.submit(f"job{i}", None) for i in range(3)]
+    assert all(e.started for e in entries)
+
+
+def test_retry_after_scales_with_waves_and_is_capped():
+    scheduler = JobScheduler(max_concurrent=2)
+    scheduler._avg_seconds = 10
+    assert scheduler.retry_after(1) == 10
+    assert scheduler.retry_after(3) == 20
+    assert scheduler.retry_after(10_000) == MAX_RETRY_AFTER
+
+
+def test_queued_job_starts_when_a_slot_frees_and_reports_positions():
+    async def main():
+        scheduler = JobScheduler(max_concurrent=1, max_queue=5, per_user=5, per_user_queue=5)
+        first = scheduler.submit("a", "alice")
+        second = scheduler.submit("b", "bob")
+        release = asyncio.Event()
+        positions = []
+
+        async def run(entry, on_position=None):
+            async with scheduler.slot(entry, on_position):
+                await release.wait()
+                return entry.job_id
+
+        async def report(position):
+            positions.append(position)
+
+        first_task = asyncio.create_task(run(first))
+        second_task = asyncio.create_task(run(second, report))
+        await asyncio.sleep(0)
+        assert not second.started
+        release.set()
+        assert await first_task == "a"
+        assert await second_task == "b"
+        assert positions == [1]
+        assert scheduler.stats()["running"] == 0
+        assert scheduler.stats()["queued"] == 0
+
+    asyncio.run(main())
+
+
+def test_cancelling_a_queued_job_removes_it():
+    async def main():
+        scheduler = JobScheduler(max_concurrent=1, max_queue=5, per_user=5, per_user_queue=5)
+        scheduler.submit("a", "alice")
+        queued = scheduler.submit("b", "bob")
+
+        async def run():
+            async with scheduler.slot(queued):
+                pass
+
+        task = asyncio.create_task(run())
+        await asyncio.sleep(0)
+        assert scheduler.cancel("b")
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert scheduler.stats()["queued"] == 0
+        assert not scheduler.cancel("b")
+
+    asyncio.run(main())
+
+
+def test_job_cancelled_before_its_slot_never_runs():
+    async def main():
+        scheduler = JobScheduler(max_concurrent=1)
+        entry = scheduler.submit("a", "alice")
+        scheduler.cancel("a")
+        ran = False
+        with pytest.raises(asyncio.CancelledError):
+            async with scheduler.slot(entry):
+                ran = True
+        assert not ran
+        assert scheduler.stats()["running"] == 0
+
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from app.core import structured
+from app.core.structured import OutputParseError, extract_json, parse_profiles, parse_selected_ids
+
+
+@pytest.mark.parametrize("reply", [
+    '[{"id": "a"}]',
+    '```json\n[{"id": "a"}]\n```',
+    '```\n[{"id": "a"}]\n```',
+    'Here are the profiles:\n[{"id": "a"}]\nLet me know if you need more.',
+    '  \n[{"id": "a"}]  ',
+])
+def test_extract_json_tolerates_fences_and_chatter(reply):
+    assert extract_json(reply) == [{"id": "a"}]
+
+
+def test_extract_json_skips_brackets_that_are_not_json():
+    assert extract_json('Profiles [see below]: ["a", "b"]') == ["a", "b"]
+
+
+@pytest.mark.parametrize("reply", ["", "no json here", "[{\"id\": \"a\"", None])
+def test_extract_json_rejects_replies_without_json(reply):
+    with pytest.raises(OutputParseError):
+        extract_json(reply)
+
+
+def test_parse_profiles_validates_and_normalizes():
+    profiles = parse_profiles('[{"id": 7, "title": "T", "perspective": "labor", "extra": 1}]')
+    assert profiles == [{"id": "7", "title": "T", "perspective": ["labor"], "extra": 1}]
+
+
+def test_parse_profiles_unwraps_an_object():
+    assert parse_profiles('{"profiles": [{"id": "a"}]}') == [{"id": "a"}]
+
+
+def test_parse_profiles_drops_invalid_entries():
+    assert parse_profiles('[{"id": "a"}, {"title": "no id"}, "junk"]') == [{"id": "a"}]
+
+
+@pytest.mark.parametrize("reply", ["[]", '{"profiles": []}', '[{"title": "no id"}]', '{"id": "a"}', '"a"'])
+def test_parse_profiles_rejects_replies_without_a_valid_profile(reply):
+    with pytest.raises(OutputParseError):
+        parse_profiles(reply)
+
+
+def test_parse_selected_ids_accepts_strings_numbers_and_objects():
+    assert parse_selected_ids('["a", 2, {"id": "c"}, {"title": "x"}, ""]') == ["a", "2", "c"]
+
+
+@pytest.mark.parametrize("reply", ["[]", '[{"title": "x"}]', '{"a": 1}'])
+def test_parse_selected_ids_rejects_replies_without_ids(reply):
+    with pytest.raises(OutputParseError):
+        parse_selected_ids(reply)
+
+
+def _fake_agent_replies(monkeypatch, replies):
+    calls = []
+    replies = iter(replies)
+
+    async def run_agent(agent, messages, step, on_delta=None):
+        calls.append(list(messages))
+        return next(replies)
+
+    monkeypatch.setattr(structured, "run_agent", run_agent)
+    monkeypatch.setattr(structured, "STRUCTURED_REPAIR_RETRIES", 1)
+    return calls
+
+
+def test_run_structured_repairs_an_unparsable_reply(monkeypatch):
+    calls = _fake_agent_replies(monkeypatch, ["sorry, [oops", '["a"]'])
+    result = asyncio.run(structured.run_structured(None, [{"role": "user", "content": "x"}], "selection", parse_selected_ids))
+    assert result == ["a"]
+    assert len(calls) == 2
+    assert calls[1][1] == {"role": "assistant", "content": "sorry, [oops"}
+    assert calls[1][2]["role"] == "user"
+
+
+def test_run_structured_gives_up_after_the_repair_budget(monkeypatch):
+    calls = _fake_agent_replies(monkeypatch, ["nope", "still nope"])
+    with pytest.raises(OutputParseError):
+        asyncio.run(structured.run_structured(None, [], "selection", parse_selected_ids))
+    assert len(calls) == 2